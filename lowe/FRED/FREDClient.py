@@ -1,17 +1,109 @@
-import pandas as pd
+from __future__ import annotations  # Annotations like pd.Series would load pandas
+
 import asyncio
-import aiohttp
 import backoff
 import os
 import sys
+import time
 
 from dotenv import load_dotenv
-from typing import List
+from email.utils import parsedate_to_datetime
+from lowe.utils.lazy import lazy_import
+from typing import Dict, List, Union
 from aiolimiter import AsyncLimiter
 
+from .catalog import SERIES_FIELDS, SeriesCatalog
+from .store import SeriesStore
+
+# Loaded the first time they are used, so importing the client is quick
+aiohttp = lazy_import("aiohttp")
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+def _count_retry(details: dict):
+    """backoff handler that counts retries on the client making the request"""
+    details["args"][0].stats["retries"] += 1
+
+
+def _count_giveup(details: dict):
+    """backoff handler that counts requests that failed after all retries"""
+    details["args"][0].stats["giveups"] += 1
+
+
+def _not_client_error(e: Exception) -> bool:
+    """backoff giveup check, so that only aiohttp errors are retried
+
+    429 responses aren't retried either: _request_json has already waited out
+    max_throttled of them, and more requests would only make the throttling worse
+    """
+    # Checked here instead of passing the exception types to the decorator,
+    # which would load aiohttp when this module is imported
+    if isinstance(e, aiohttp.ClientResponseError) and e.status == 429:
+        return True
+    return not isinstance(e, aiohttp.ClientError)
+
+
+# Seconds to wait after a 429 response that doesn't say how long to wait
+DEFAULT_RETRY_AFTER = 20
+
+
+def _retry_after(headers) -> float:
+    """Returns the number of seconds a Retry-After header asks us to wait"""
+    value = headers.get("Retry-After", None)
+    if value is None:
+        return DEFAULT_RETRY_AFTER
+    try:
+        return max(float(value), 0)
+    except ValueError:  # Retry-After can also be an HTTP date
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            return DEFAULT_RETRY_AFTER
+
+
+def parse_observations(dates, values, name: str = None) -> pd.Series:
+    """parse_observations turns the dates and values of FRED observations into a typed series
+
+    Parameters
+    ----------
+    dates : array-like
+        Observation dates as returned by the API, ex. ["2020-01-01", "2020-02-01"]
+    values : array-like
+        Observation values as returned by the API, ex. ["258.682", "."]
+    name : str, optional
+        Name of the series, usually its series ID, by default None
+
+    Returns
+    -------
+    pd.Series
+        float64 values indexed by a DatetimeIndex named "date". Missing values ("." in FRED) are NaN
+    """
+    values = np.asarray(values, dtype=object)
+    values = np.where(values == ".", "nan", values).astype(np.float64)
+    index = pd.DatetimeIndex(np.asarray(dates, dtype="datetime64[D]"), name="date")
+    return pd.Series(values, index=index, name=name)
+
+
+def align_series(series: Dict[str, pd.Series]) -> pd.DataFrame:
+    """align_series joins parsed series into one dataframe with a column per series
+
+    Dates that are missing from a series (ex. because it has a lower frequency) are NaN in its column
+    """
+    if not series:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="date"))
+    return pd.concat(series, axis=1, join="outer").sort_index()
+
 
 class FREDClient(object):
-    def __init__(self, key_env_name: str = "API_KEY_FRED"):
+    def __init__(
+        self,
+        key_env_name: str = "API_KEY_FRED",
+        store_dir: str = None,
+        use_catalog: bool = True,
+        catalog_path: str = None,
+        catalog_max_age: Union[int, float] = 60 * 60,
+    ):
         """the FRED Client class provides methods for wrapping around the FRED client
 
         Parameters
@@ -19,10 +111,20 @@ class FREDClient(object):
         key_env_name : str, optional
             name of the environment variable in your .env
             file corresponding to your FRED API key, by default "FRED_KEY_FRED"
+        store_dir : str, optional
+            Directory of a local store of series observations, by default None (no store)
+            Needs pyarrow. sync_fred() keeps the series in it up to date
+        use_catalog : bool, optional
+            Whether or not to keep series metadata in a local SQLite database, by default True
+            Metadata lookups and the freshness checks in sync_fred() then only go to FRED
+            once every catalog_max_age seconds
+        catalog_path : str, optional
+            Path of the metadata database, by default "~/.cache/lowe/fred/series.sqlite"
+        catalog_max_age : Union[int, float], optional
+            Seconds before stored metadata of a series is looked up again, by default 1 hour
         """
         load_dotenv()
         self.API_KEY = os.environ.get(key_env_name, None)
-        self.limiter = AsyncLimiter(120, 60)
         try:
             assert self.API_KEY is not None
         except AssertionError:
@@ -31,29 +133,79 @@ class FREDClient(object):
                     as an environment variable under the name {key_env_name}."
             )
 
-    async def initialize(self):
-        self.session = aiohttp.ClientSession()
+        # Number of times a request waits out a 429 response before giving up
+        self.max_throttled = 5
+
+        self.store = SeriesStore(store_dir) if store_dir is not None else None
+        self.catalog = (
+            SeriesCatalog(db_path=catalog_path, max_age=catalog_max_age)
+            if use_catalog
+            else None
+        )
+
+        # Request counters, see initialize() for the limits that apply to requests
+        self.stats = {"requests": 0, "throttled": 0, "retries": 0, "giveups": 0}
+
+    async def initialize(
+        self,
+        max_in_flight: int = 10,
+        rate_limit: float = 120,
+        rate_period: float = 60,
+        keepalive_timeout: float = 60,
+    ):
+        """initialize opens the aiohttp session used for requests and sets up rate limiting
+
+        Parameters
+        ----------
+        max_in_flight : int, optional
+            Maximum number of API requests waiting on a response at once, by default 10
+            This is also the number of connections kept open to api.stlouisfed.org
+        rate_limit : float, optional
+            Number of requests allowed every rate_period seconds, by default 120 (FRED's limit)
+            Requests over this rate wait for a slot instead of being sent and rejected
+        rate_period : float, optional
+            Length of the rate limiting window in seconds, by default 60
+        keepalive_timeout : float, optional
+            Seconds to keep idle connections open for reuse, by default 60
+        """
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.limiter = AsyncLimiter(rate_limit, rate_period)
+
+        connector = aiohttp.TCPConnector(
+            limit=max_in_flight,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=300,
+        )
+        self.session = aiohttp.ClientSession(connector=connector)
 
     async def close(self):
-        if not self.session.closed:
+        if getattr(self, "session", None) is not None and not self.session.closed:
             await self.session.close()
 
-    def _base_url(self):
-        base = "https://api.stlouisfed.org/fred/series/observations"
+    async def __aenter__(self):
+        """Lets the client be used as `async with FREDClient() as client:`, which closes the session at the end"""
+        await self.initialize()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _base_url(self, endpoint: str = "series/observations"):
+        base = f"https://api.stlouisfed.org/fred/{endpoint}"
         return base
 
     @backoff.on_exception(
-        backoff.expo, (aiohttp.ClientError, aiohttp.ClientResponseError), max_tries=3
+        backoff.expo,
+        Exception,
+        giveup=_not_client_error,
+        max_tries=3,
+        on_backoff=_count_retry,
+        on_giveup=_count_giveup,
     )
-    async def _scrape_fred_json(
-        self,
-        seriesid: str,
-        startDate: str = "2009-01-01",
-        endDate: str = "2010-12-01",
-        file_type: str = "json",
-        frequency: str = "m",
-        debug: bool = False,
+    async def _request_json(
+        self, endpoint: str, params: Dict[str, str], debug: bool = False
     ):
+        """Sends one rate limited request to a FRED API endpoint and returns the JSON response"""
         try:
             assert self.session is not None
         except AssertionError:
@@ -62,38 +214,52 @@ class FREDClient(object):
                    session with `client.initialize()`"
             )
 
-        base_url = self._base_url()
-        api_key = self.API_KEY
+        base_url = self._base_url(endpoint)
+        params = {**params, "api_key": self.API_KEY, "file_type": "json"}
+        # Leave out parameters we weren't given so FRED uses its defaults
+        params = {k: v for k, v in params.items() if v is not None}
+
+        for attempt in range(self.max_throttled + 1):
+            # Every request waits for both a free slot and a rate limit token
+            async with self.semaphore, self.limiter:
+                self.stats["requests"] += 1
+                async with self.session.get(base_url, params=params) as resp:
+                    if debug:
+                        print(resp.url)
+                        print(resp.status)
+                    if resp.status != 429 or attempt == self.max_throttled:
+                        resp.raise_for_status()
+                        return await resp.json()
+                    wait = _retry_after(resp.headers)
+
+            # Too many requests: wait as long as FRED asks (without holding a slot) and try again
+            self.stats["throttled"] += 1
+            if debug:
+                print(f"Warning: FRED rate limit hit, retrying in {wait}s")
+            await asyncio.sleep(wait)
 
+    async def _scrape_fred_json(
+        self,
+        seriesid: str,
+        startDate: str = "2009-01-01",
+        endDate: str = "2010-12-01",
+        file_type: str = "json",
+        frequency: str = "m",
+        debug: bool = False,
+    ):
         params = {
             "series_id": seriesid,
             "observation_start": startDate,
             "observation_end": endDate,
             "frequency": frequency,
-            "api_key": api_key,
-            "file_type": file_type,
         }
+        # file_type is only kept for compatibility, responses are always requested as JSON
+        return await self._request_json("series/observations", params, debug)
 
-        async with self.session.get(
-            base_url, params=params, raise_for_status=True
-        ) as resp:
-            if debug:
-                print(resp.url)
-                print(resp.status)
-            return await resp.json()
-
-    def _parse_fred_series(self, series: str):
-        observation_date = []
-        value = []
-
-        for item in series:
-            val = item["value"]
-            value.append(val)
-            time = item["date"]
-            observation_date.append(time)
-
-        df = pd.DataFrame({"observation_date": observation_date, "value": value})
-        return df
+    def _parse_fred_series(self, series: List[dict], name: str = None) -> pd.Series:
+        return parse_observations(
+            [item["date"] for item in series], [item["value"] for item in series], name
+        )
 
     async def _full_fred_scrape(
         self,
@@ -119,13 +285,13 @@ class FREDClient(object):
         if debug:
             print("series = ", series)
 
-        df = self._parse_fred_series(series)
+        df = self._parse_fred_series(series, name=seriesid)
         result.append([seriesid1, df])
 
         if export:
             for res in result:
                 name = res[0] + ".csv"
-                res[1].to_csv(name, index=False)
+                res[1].to_csv(name)
 
         return result
 
@@ -156,24 +322,331 @@ class FREDClient(object):
         export: bool
             Allows you to decide whether you want to export the file as a csv
         """
-        async with self.limiter:
-            resp = await asyncio.gather(
-                *[
-                    self._full_fred_scrape(
-                        seriesid=table,
-                        startDate=startDate,
-                        endDate=endDate,
-                        file_type=file_type,
-                        frequency=frequency,
-                        export=export,
-                        debug=debug,
-                    )
-                    for table in vars
-                ]
-            )
+        # Rate limiting is applied to each request in _scrape_fred_json
+        resp = await asyncio.gather(
+            *[
+                self._full_fred_scrape(
+                    seriesid=table,
+                    startDate=startDate,
+                    endDate=endDate,
+                    file_type=file_type,
+                    frequency=frequency,
+                    export=export,
+                    debug=debug,
+                )
+                for table in vars
+            ]
+        )
 
         return resp
 
+    async def _timed_scrape(
+        self,
+        seriesid: str,
+        startDate: str,
+        endDate: str,
+        frequency: str,
+        debug: bool = False,
+    ):
+        """Fetches one series for get_fred_bulk, returning its observations and a report row"""
+        start = time.perf_counter()
+        try:
+            req = await self._scrape_fred_json(
+                seriesid, startDate, endDate, "json", frequency, debug
+            )
+            observations = req["observations"]
+            error = None
+        except aiohttp.ClientResponseError as e:
+            # Not str(e), since the request URL has our API key in it
+            observations = None
+            error = f"HTTP {e.status}: {e.message}"
+        except (aiohttp.ClientError, KeyError) as e:
+            observations = None
+            error = f"{type(e).__name__}: {e}"
+
+        report = {
+            "series_id": seriesid,
+            "observations": len(observations) if observations is not None else 0,
+            "latency": time.perf_counter() - start,
+            "error": error,
+        }
+        return observations, report
+
+    async def get_fred_bulk(
+        self,
+        vars: List[str],
+        startDate: str = None,
+        endDate: str = None,
+        frequency: str = None,
+        wide: bool = False,
+        debug: bool = False,
+    ):
+        """get_fred_bulk fetches many FRED series at once, as fast as the rate limits set in initialize() allow
+
+        Unlike get_fred, a series that fails doesn't stop the others from being fetched.
+
+        Parameters
+        ----------
+        vars : List[str]
+            Series IDs to fetch, example ["GNPCA", "GDP", "CPIAUCSL"]. Duplicates are only fetched once
+        startDate : str, optional
+            The first date we want to collect data at, by default None (the start of the series)
+        endDate : str, optional
+            The last date we want to collect data at, by default None (the latest observation)
+        frequency : str, optional
+            The frequency of the data you want to grab: m (monthly), a (annual), q (quarterly), etc
+            By default None (the native frequency of each series)
+        wide : bool, optional
+            If True, returns the series aligned on date in one dataframe with a column per series,
+            by default False
+        debug : bool, optional
+            If True, prints out extra information useful for debugging
+
+        Returns
+        -------
+        Tuple[Dict[str, pd.Series], pd.DataFrame]
+            Observations of each series that was fetched, keyed on series ID (or one dataframe
+            if wide is True), and a report
+            with one row per series: the number of observations, seconds taken to fetch it
+            (including time spent waiting on the rate limit), and the error if it failed
+        """
+        seriesids = list(dict.fromkeys(vars))
+        fetched = await asyncio.gather(
+            *[
+                self._timed_scrape(seriesid, startDate, endDate, frequency, debug)
+                for seriesid in seriesids
+            ]
+        )
+
+        results = {}
+        for seriesid, (observations, report) in zip(seriesids, fetched):
+            if observations is not None:
+                results[seriesid] = self._parse_fred_series(observations, seriesid)
+            else:
+                print(f"Warning: could not fetch {seriesid}: {report['error']}")
+
+        report = pd.DataFrame([report for _, report in fetched]).set_index("series_id")
+        if wide:
+            results = align_series(results)
+        return results, report
+
+    async def _series_info(self, seriesid: str, debug: bool = False) -> dict:
+        """Returns the metadata of a series, from the catalog if it has a recent enough copy"""
+        if self.catalog is not None:
+            info = self.catalog.get(seriesid)
+            if info is not None:
+                return info
+
+        req = await self._request_json("series", {"series_id": seriesid}, debug)
+        info = req["seriess"][0]
+        if self.catalog is not None:
+            self.catalog.put([info])
+        return info
+
+    async def get_series_info(self, vars: List[str], debug: bool = False):
+        """get_series_info looks up metadata (title, frequency, units, last_updated, ...) of FRED series
+
+        Parameters
+        ----------
+        vars : List[str]
+            Series IDs to look up, example ["CPIAUCSL", "UNRATE"]
+        debug : bool, optional
+            If True, prints out extra information useful for debugging
+
+        Returns
+        -------
+        pd.DataFrame
+            One row of metadata per series, indexed by series ID
+        """
+        seriesids = list(dict.fromkeys(vars))
+        resp = await asyncio.gather(
+            *[self._series_info(seriesid, debug) for seriesid in seriesids]
+        )
+        return pd.DataFrame(resp, columns=SERIES_FIELDS).set_index("id")
+
+    async def search_fred(
+        self,
+        text: str,
+        limit: int = 20,
+        order_by: str = "search_rank",
+        local: bool = False,
+        debug: bool = False,
+    ):
+        """search_fred searches FRED for series matching some text, ex. "consumer price index"
+
+        Every series found is also saved to the catalog, so looking it up later doesn't
+        need another request.
+
+        Parameters
+        ----------
+        text : str
+            Words to search for
+        limit : int, optional
+            Maximum number of series to return, by default 20
+        order_by : str, optional
+            How FRED orders the results, ex. "search_rank" or "popularity", by default "search_rank"
+        local : bool, optional
+            If True, only searches series already in the catalog without making a request,
+            by default False. Results are then ordered by popularity
+        debug : bool, optional
+            If True, prints out extra information useful for debugging
+
+        Returns
+        -------
+        pd.DataFrame
+            Metadata of the matching series, indexed by series ID
+        """
+        if local:
+            if self.catalog is None:
+                raise ValueError(
+                    "Error: local search needs the catalog. Create the client with use_catalog=True."
+                )
+            series = self.catalog.search(text, limit=limit)
+        else:
+            params = {"search_text": text, "limit": limit, "order_by": order_by}
+            req = await self._request_json("series/search", params, debug)
+            series = req["seriess"]
+            if self.catalog is not None:
+                self.catalog.put(series)
+
+        return pd.DataFrame(series, columns=SERIES_FIELDS).set_index("id")
+
+    async def stale_series(
+        self, vars: List[str], frequency: str = None, debug: bool = False
+    ) -> List[str]:
+        """stale_series returns the series whose stored observations are older than FRED's latest update
+
+        Parameters
+        ----------
+        vars : List[str]
+            Series IDs to check, example ["CPIAUCSL", "UNRATE"]
+        frequency : str, optional
+            Frequency the series were synced at, by default None (native frequency)
+        debug : bool, optional
+            If True, prints out extra information useful for debugging
+
+        Returns
+        -------
+        List[str]
+            Series that are missing from the store or were updated since they were synced
+        """
+        if self.store is None:
+            raise ValueError(
+                "Error: stale_series needs a local store. Create the client with FREDClient(store_dir=...)."
+            )
+
+        seriesids = list(dict.fromkeys(vars))
+        info = await asyncio.gather(
+            *[self._series_info(seriesid, debug) for seriesid in seriesids]
+        )
+
+        stale = []
+        for seriesid, series_info in zip(seriesids, info):
+            meta = self.store.read_meta(seriesid, frequency)
+            if meta is None or meta["last_updated"] != series_info["last_updated"]:
+                stale.append(seriesid)
+        return stale
+
+    async def _sync_series(
+        self,
+        seriesid: str,
+        frequency: str = None,
+        revision_window: int = 24,
+        full: bool = False,
+        debug: bool = False,
+    ):
+        """Brings one stored series up to date and returns all of its stored observations"""
+        last_updated = (await self._series_info(seriesid, debug))["last_updated"]
+
+        meta = self.store.read_meta(seriesid, frequency)
+        if not full and meta is not None and meta["last_updated"] == last_updated:
+            if debug:
+                print(f"{seriesid} is up to date (last updated {last_updated})")
+            return self.store.read(seriesid, frequency)
+
+        # Refetch the last revision_window observations along with any new ones,
+        # since recent observations are the ones that get revised
+        stored = self.store.read(seriesid, frequency)
+        since = None
+        if not full and meta is not None and len(stored) > 0:
+            since = stored["date"].iloc[-min(revision_window, len(stored))]
+
+        req = await self._request_json(
+            "series/observations",
+            {"series_id": seriesid, "observation_start": since, "frequency": frequency},
+            debug,
+        )
+        observations = pd.DataFrame(req["observations"], columns=["date", "value"])
+        if debug:
+            print(f"{seriesid}: fetched {len(observations)} observations since {since}")
+
+        self.store.write(
+            seriesid,
+            frequency,
+            observations,
+            meta={"last_updated": last_updated, "synced_at": time.time()},
+            since=since,
+        )
+        return self.store.read(seriesid, frequency)
+
+    async def sync_fred(
+        self,
+        vars: List[str],
+        frequency: str = None,
+        revision_window: int = 24,
+        full: bool = False,
+        wide: bool = False,
+        debug: bool = False,
+    ):
+        """sync_fred updates series in the local store, only fetching observations it doesn't already have
+
+        For each series, the client first checks when FRED last updated the series (using the
+        catalog if it looked this up recently). If that hasn't changed since the last sync,
+        nothing else is requested. Otherwise, only the
+        observations from the last revision_window stored dates on are fetched, which picks
+        up new observations and revisions to recent ones.
+
+        Parameters
+        ----------
+        vars : List[str]
+            Series IDs to sync, example ["CPIAUCSL", "UNRATE"]
+        frequency : str, optional
+            The frequency of the data you want to keep: m (monthly), a (annual), q (quarterly), etc
+            By default None (the native frequency of each series)
+        revision_window : int, optional
+            Number of the latest stored observations to refetch in case they were revised, by default 24
+        full : bool, optional
+            If True, refetches every observation of every series, by default False
+        wide : bool, optional
+            If True, returns the series aligned on date in one dataframe with a column per series,
+            by default False
+        debug : bool, optional
+            If True, prints out extra information useful for debugging
+
+        Returns
+        -------
+        Dict[str, pd.Series], pd.DataFrame
+            Every stored observation of each series, keyed on series ID (or one dataframe
+            if wide is True)
+        """
+        if self.store is None:
+            raise ValueError(
+                "Error: sync_fred needs a local store. Create the client with FREDClient(store_dir=...)."
+            )
+
+        seriesids = list(dict.fromkeys(vars))
+        resp = await asyncio.gather(
+            *[
+                self._sync_series(seriesid, frequency, revision_window, full, debug)
+                for seriesid in seriesids
+            ]
+        )
+        results = {
+            seriesid: parse_observations(df["date"], df["value"], seriesid)
+            for seriesid, df in zip(seriesids, resp)
+        }
+        return align_series(results) if wide else results
+
 
 async def main():
     subjects = ["GNPCA", "GDP"]
@@ -197,7 +670,8 @@ async def main():
     return test_resp
 
 
-if sys.platform == "win32":
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-asyncio.run(main())
+    asyncio.run(main())
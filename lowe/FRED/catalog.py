@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import time
+
+from contextlib import closing
+from typing import Dict, List, Union
+
+# Series metadata fields returned by the FRED API that are kept in the catalog
+SERIES_FIELDS = [
+    "id",
+    "title",
+    "observation_start",
+    "observation_end",
+    "frequency",
+    "frequency_short",
+    "units",
+    "units_short",
+    "seasonal_adjustment",
+    "seasonal_adjustment_short",
+    "last_updated",
+    "popularity",
+    "notes",
+]
+
+
+class SeriesCatalog(object):
+    def __init__(self, db_path: str = None, max_age: Union[int, float] = 60 * 60):
+        """the SeriesCatalog class keeps FRED series metadata in a local SQLite database
+
+        Parameters
+        ----------
+        db_path : str, optional
+            Path of the database file, by default "~/.cache/lowe/fred/series.sqlite"
+        max_age : Union[int, float], optional
+            Number of seconds stored metadata is used before it is looked up again, by default 1 hour
+            Pass None to never look it up again
+        """
+        if db_path is None:
+            db_path = os.path.join(
+                os.path.expanduser("~"), ".cache", "lowe", "fred", "series.sqlite"
+            )
+        self.db_path = db_path
+        self.max_age = max_age
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        columns = ", ".join(
+            f"{field} {'INTEGER' if field == 'popularity' else 'TEXT'}"
+            for field in SERIES_FIELDS[1:]
+        )
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS series (id TEXT PRIMARY KEY, {columns}, fetched_at REAL)"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get(self, seriesid: str) -> Dict[str, str]:
+        """Returns the stored metadata of a series, or None if it is missing or older than max_age"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT * FROM series WHERE id = ?", (seriesid.upper(),)
+            ).fetchone()
+
+        if row is None:
+            return None
+        if self.max_age is not None and time.time() - row["fetched_at"] > self.max_age:
+            return None
+        return dict(row)
+
+    def put(self, series: List[dict]):
+        """Stores the metadata of series as returned by the FRED API ("seriess" entries)"""
+        now = time.time()
+        rows = [
+            [info.get(field, None) for field in SERIES_FIELDS] + [now]
+            for info in series
+        ]
+        placeholders = ", ".join("?" * (len(SERIES_FIELDS) + 1))
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO series VALUES ({placeholders})", rows
+            )
+
+    def search(self, text: str, limit: int = 20) -> List[Dict[str, str]]:
+        """search looks through stored series for ones whose ID or title contains every word of text
+
+        Only series that were looked up or found by a search before are stored, so this
+        works offline but can miss series that FRED's own search would find.
+        """
+        words = text.split()
+        where = " AND ".join(["(id LIKE ? OR title LIKE ?)"] * len(words)) or "1"
+        params = [f"%{word}%" for word in words for _ in range(2)]
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT * FROM series WHERE {where} "
+                "ORDER BY popularity DESC LIMIT ?",
+                params + [limit],
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def clear(self):
+        """Deletes every stored series"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM series")
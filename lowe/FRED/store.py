@@ -0,0 +1,113 @@
+from __future__ import annotations  # Annotations like pd.DataFrame would load pandas
+
+import importlib.util
+import json
+import os
+
+from lowe.utils.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+
+class SeriesStore(object):
+    def __init__(self, store_dir: str):
+        """the SeriesStore class keeps fetched FRED observations in local Parquet files
+
+        Each series is kept at the frequency it was requested in, along with the FRED
+        last_updated time of the series when it was synced:
+            [store_dir]/CPIAUCSL/m.parquet
+            [store_dir]/CPIAUCSL/m.json
+
+        Parameters
+        ----------
+        store_dir : str
+            Directory for the store. It is created if it does not exist
+        """
+        # pyarrow is only needed if you use a SeriesStore
+        if importlib.util.find_spec("pyarrow") is None:
+            raise ImportError(
+                "Error: the FRED series store needs pyarrow. Install it with `pip install pyarrow`."
+            )
+        self.store_dir = store_dir
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def _path(self, seriesid: str, frequency: str, ext: str) -> str:
+        # None means the native frequency of the series
+        return os.path.join(
+            self.store_dir, seriesid.upper(), f"{frequency or 'native'}.{ext}"
+        )
+
+    def read(self, seriesid: str, frequency: str = None) -> pd.DataFrame:
+        """read returns the stored observations of a series, sorted by date
+
+        Parameters
+        ----------
+        seriesid : str
+            Series to read, ex. "CPIAUCSL"
+        frequency : str, optional
+            Frequency the series was synced at, by default None (native frequency)
+
+        Returns
+        -------
+        pd.DataFrame
+            Observations with "date" and "value" columns, as returned by the API.
+            Empty if the series isn't stored
+        """
+        path = self._path(seriesid, frequency, "parquet")
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=["date", "value"])
+        return pd.read_parquet(path)
+
+    def read_meta(self, seriesid: str, frequency: str = None) -> dict:
+        """Returns the sync metadata of a stored series, or None if it isn't stored"""
+        path = self._path(seriesid, frequency, "json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write(
+        self,
+        seriesid: str,
+        frequency: str,
+        observations: pd.DataFrame,
+        meta: dict,
+        since: str = None,
+    ):
+        """write saves fetched observations of a series along with its sync metadata
+
+        Parameters
+        ----------
+        seriesid : str
+            Series the observations are for, ex. "CPIAUCSL"
+        frequency : str
+            Frequency the observations were requested at, None for the native frequency
+        observations : pd.DataFrame
+            Fetched observations with "date" and "value" columns
+        meta : dict
+            Sync metadata to save, ex. {"last_updated": "2021-10-13 07:37:02-05"}
+        since : str, optional
+            Date the fetch started at, by default None (the whole series was fetched)
+            Stored observations from this date on are replaced by the fetched ones, so
+            revised values overwrite old ones
+        """
+        observations = observations[["date", "value"]].astype("string")
+        if since is not None:
+            stored = self.read(seriesid, frequency)
+            stored = stored[stored["date"] < since]
+            observations = pd.concat([stored, observations], ignore_index=True)
+        observations = observations.sort_values("date", ignore_index=True)
+
+        path = self._path(seriesid, frequency, "parquet")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        observations.to_parquet(tmp, index=False)
+        os.replace(tmp, path)  # Atomic, so readers never see half a file
+
+        # Written after the observations, so the metadata never claims more than is stored
+        path = self._path(seriesid, frequency, "json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
@@ -1,25 +1,59 @@
 import asyncio
 import aiohttp
+import atexit
 import backoff
+import functools
 import json
+import numpy as np
 import os
 import pandas as pd
 import requests
+import threading
 
+from aiolimiter import AsyncLimiter
 from dotenv import load_dotenv, find_dotenv
 from lowe.locations.lookup import name2fips, fips2name
+from lowe.utils.eventloop import get_loop
 from typing import Union, List, Dict
 
-try:
-    import importlib.resources as pkg_resources
-except ImportError:
-    import importlib_resources as pkg_resources
+from .cache import ResponseCache
+from .store import TableStore
+from .variables import VariableDefinitions, load_var_defs
 
-from . import tableids
+
+def _count_retry(details: dict):
+    """backoff handler that counts retries on the client making the request"""
+    details["args"][0].stats["retries"] += 1
+
+
+def _count_giveup(details: dict):
+    """backoff handler that counts requests that failed after all retries"""
+    details["args"][0].stats["giveups"] += 1
+
+
+# The Census API uses these values in place of estimates that are missing,
+# suppressed, or could not be computed. Typed output replaces them with NaN
+CENSUS_SENTINELS = [
+    -111111111,
+    -222222222,
+    -333333333,
+    -555555555,
+    -666666666,
+    -888888888,
+    -999999999,
+]
 
 
 class ACSClient(object):
-    def __init__(self, key_env_name: str = "API_KEY_ACS"):
+    def __init__(
+        self,
+        key_env_name: str = "API_KEY_ACS",
+        use_cache: bool = True,
+        cache_dir: str = None,
+        cache_ttl: Union[int, float] = 30 * 24 * 60 * 60,
+        cache_max_size: int = 500 * 1024 * 1024,
+        store_dir: str = None,
+    ):
         """the ACS Client class provides methods for wrapping around the ACS client
 
         Parameters
@@ -27,6 +61,18 @@ class ACSClient(object):
         key_env_name : str, optional
             name of the environment variable in your .env
             file corresponding to your ACS API key, by default "API_KEY_ACS"
+        use_cache : bool, optional
+            Whether or not to keep API responses in an on-disk cache, by default True
+            Repeated requests for the same table, year, and geography are then read from disk
+        cache_dir : str, optional
+            Directory for the response cache, by default "~/.cache/lowe/acs"
+        cache_ttl : Union[int, float], optional
+            Seconds before a cached response is refetched, by default 30 days
+        cache_max_size : int, optional
+            Maximum size of the response cache in bytes, by default 500 MB
+        store_dir : str, optional
+            Directory of a local Parquet dataset to save every fetched table to, by default None (no store)
+            Needs pyarrow. Stored tables can be queried later with client.store.read()
         """
         load_dotenv(find_dotenv())
         self.API_KEY = os.environ.get(key_env_name, None)
@@ -50,13 +96,69 @@ class ACSClient(object):
             "cprofile": "/cprofile",
         }
 
-    async def initialize(self):
-        self.session = aiohttp.ClientSession()
+        # Maximum number of geographies requested in one API call
+        self.batch_size = 100
+        # Maximum number of variables the ACS API accepts in one API call
+        self.max_variables = 50
+
+        self.cache = (
+            ResponseCache(cache_dir=cache_dir, ttl=cache_ttl, max_size=cache_max_size)
+            if use_cache
+            else None
+        )
+
+        self.store = TableStore(store_dir) if store_dir is not None else None
+
+        # Request counters, see initialize() for the limits that apply to requests
+        self.stats = {"requests": 0, "cache_hits": 0, "retries": 0, "giveups": 0}
+
+    async def initialize(
+        self,
+        max_in_flight: int = 10,
+        limit_per_host: int = 10,
+        rate_limit: float = 25,
+        rate_period: float = 1,
+        keepalive_timeout: float = 60,
+    ):
+        """initialize opens the aiohttp session used for requests and sets up rate limiting
+
+        Parameters
+        ----------
+        max_in_flight : int, optional
+            Maximum number of API requests waiting on a response at once, by default 10
+        limit_per_host : int, optional
+            Maximum number of open connections to api.census.gov, by default 10
+        rate_limit : float, optional
+            Number of requests allowed every rate_period seconds, by default 25
+            Requests over this rate wait for a slot instead of being sent and retried
+        rate_period : float, optional
+            Length of the rate limiting window in seconds, by default 1
+        keepalive_timeout : float, optional
+            Seconds to keep idle connections open for reuse, by default 60
+        """
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.limiter = AsyncLimiter(rate_limit, rate_period)
+
+        connector = aiohttp.TCPConnector(
+            limit=max_in_flight,
+            limit_per_host=limit_per_host,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=300,
+        )
+        self.session = aiohttp.ClientSession(connector=connector)
 
     async def close(self):
-        if not self.session.closed:
+        if getattr(self, "session", None) is not None and not self.session.closed:
             await self.session.close()
 
+    async def __aenter__(self):
+        """Lets the client be used as `async with ACSClient() as client:`, which closes the session at the end"""
+        await self.initialize()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
     def _base_uri(
         self,
         year: Union[int, str],
@@ -138,7 +240,11 @@ class ACSClient(object):
             return f"dprofile_vars_{str(year)}.json"
 
     @backoff.on_exception(
-        backoff.expo, (aiohttp.ClientError, aiohttp.ClientResponseError), max_tries=5
+        backoff.expo,
+        (aiohttp.ClientError, aiohttp.ClientResponseError),
+        max_tries=5,
+        on_backoff=_count_retry,
+        on_giveup=_count_giveup,
     )
     async def _collect_table(
         self,
@@ -147,6 +253,7 @@ class ACSClient(object):
         location: Dict[str, str],
         tabletype: str = "detail",
         estimate: Union[int, str] = "5",
+        variables: List[str] = None,
         debug: bool = False,
     ):
         # Check to see if the client session exists
@@ -198,180 +305,474 @@ class ACSClient(object):
         if tabletype == "detail" or tabletype == "":
             params["get"] = tableid + ","
 
-        async with self.session.get(base, params=params, raise_for_status=True) as resp:
-            if debug:
-                print(resp.url)
-                print(resp.status)
-            return await resp.json()
+        # Only request these variables instead of the whole table
+        if variables is not None:
+            params["get"] = ",".join(variables)
+
+        # Cache reads and writes touch the disk, so they run in a thread off the event loop
+        loop = asyncio.get_running_loop()
+        if self.cache is not None:
+            cache_key = self.cache.make_key(base, params)
+            cached = await loop.run_in_executor(None, self.cache.get, cache_key)
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+                if debug:
+                    print(f"cache hit: {base} {params['get']} {params['for']}")
+                return cached
+
+        async with self.semaphore, self.limiter:
+            self.stats["requests"] += 1
+            async with self.session.get(
+                base, params=params, raise_for_status=True
+            ) as resp:
+                if debug:
+                    print(resp.url)
+                    print(resp.status)
+                data = await resp.json()
+
+        if self.cache is not None:
+            await loop.run_in_executor(None, self.cache.set, cache_key, data)
+
+        return data
+
+    def _geo_level(self, location: Dict[str, str]):
+        """Returns the geography level of a cleaned location dictionary if it can be batched, else None"""
+        keys = {k for k, v in location.items() if v is not None}
+        if keys == {"state"}:
+            return "state"
+        elif keys == {"state", "city"}:
+            return "city"
+        elif keys == {"state", "county"}:
+            return "county"
+        return None
 
-    async def _process_request(
+    def _plan_batches(self, locations: List[Dict[str, str]]):
+        """_plan_batches groups location dictionaries that can be fetched with a single API call
+
+        States are grouped together, and cities and counties are grouped by the state they are in,
+        since the ACS API accepts comma separated codes like for=place:55254,59500&in=state:06
+        Anything else (the whole US, MSAs, or mixed geographies) is requested on its own
+
+        Parameters
+        ----------
+        locations : List[Dict[str, str]]
+            Cleaned location dictionaries, where city and county codes no longer contain the state code
+
+        Returns
+        -------
+        List[List[int]]
+            Batches of indices into locations, in the order the locations first appear
+        """
+        groups = {}
+        for i, loc in enumerate(locations):
+            level = self._geo_level(loc)
+            if level is None:
+                key = ("single", i)
+            elif level == "state":
+                key = ("state", None)
+            else:
+                key = (level, loc["state"])
+            groups.setdefault(key, []).append(i)
+
+        batches = []
+        for idxs in groups.values():
+            for j in range(0, len(idxs), self.batch_size):
+                batches.append(idxs[j : j + self.batch_size])
+        return batches
+
+    def _merge_batch(self, locations: List[Dict[str, str]]):
+        """Combines location dictionaries of the same geography level into one with comma separated codes"""
+        if len(locations) == 1:
+            return locations[0]
+
+        merged = {}
+        # Keys without a value don't count towards the geography level, see _geo_level
+        for k in [k for k, v in locations[0].items() if v is not None]:
+            codes = []
+            for loc in locations:
+                if loc[k] not in codes:
+                    codes.append(loc[k])
+            merged[k] = ",".join(codes)
+        return merged
+
+    def _location_columns(self, location: List[Dict[str, str]]):
+        """Returns the location name columns (state, city, ..., location_key) for a list of locations"""
+        columns = {}
+        location_keys = []
+        for loc in location:
+            location_str = ""
+
+            if not loc:  # If the location is empty
+                location_str = "us"
+
+            # state_decoding = bidict({k.fips: k.abbr for k in us.states.STATES})
+            for key, value in fips2name(loc).items():
+                if key.lower() != "state":
+                    value = value.split(",")[0]
+                columns.setdefault(key.lower(), []).append(value.lower())
+                location_str += (
+                    value.lower() if len(location_str) == 0 else " " + value.lower()
+                )
+
+            location_keys.append(location_str)
+
+        columns["location_key"] = location_keys
+        return columns
+
+    def _decode_response(
         self,
-        tableid: str,
+        ids: List[str],
+        rows: List[List[str]],
         year: Union[int, str],
-        location: Dict[str, str],
-        tabletype: str = "detail",
-        estimate: Union[int, str] = "5",
-        varfile: str = "subject_vars_2019.json",
-        debug: bool = False,
+        location: List[Dict[str, str]],
+        var_defs: VariableDefinitions,
+        numeric: bool = False,
+        projected: bool = False,
     ):
-        # Pulls data from ACS
-        if debug:
-            print("making request...")
-        resp = await self._collect_table(
-            tableid=tableid,
-            year=year,
-            location=location,
-            tabletype=tabletype,
-            estimate=estimate,
-            debug=debug,
-        )
+        """Builds the output dataframe for an ACS response, with one row per location
 
-        if debug:
-            print("opening JSON...")
-        # Opens the JSON file with subject tables info
+        Parameters
+        ----------
+        ids : List[str]
+            Header row of the response
+        rows : List[List[str]]
+            Rows of the response, one per location and in the same order as location
+        year : Union[int, str]
+            Year of the response, used as the index
+        location : List[Dict[str, str]]
+            Location dictionaries the rows correspond to
+        var_defs : VariableDefinitions
+            Definitions used to name the columns
+        numeric : bool, optional
+            If True, convert int and float variables to Int64 and float32 columns, by default False
+        projected : bool, optional
+            Whether the response is for a list of variables rather than a whole table, by default False
+        """
+        # Decode the whole header at once and pick out the kept columns for every row
+        positions, labels, types = var_defs.decode_header(ids, drop_first=not projected)
+        values = np.array(rows, dtype=object).reshape(len(rows), len(ids))[:, positions]
+        index = pd.Index([year] * len(rows), name="year")
 
-        with pkg_resources.open_text(tableids, varfile) as f:
-            subjectDict = json.load(f)
+        if numeric:
+            acs_subject = self._typed_frame(values, labels, types, index)
+        else:
+            acs_subject = pd.DataFrame(values, columns=labels, index=index)
 
-        # ids: list of subject ids
-        # vals: list of corresponding values
-        if debug:
-            print("post-processing....")
-        ids, vals = resp[0], resp[1]
-        concept_label = []
-        values = []
+        for key, value in self._location_columns(location).items():
+            acs_subject[key] = value
 
-        # state_decoding = bidict({k.fips: k.abbr for k in us.states.STATES})
-        location_names = fips2name(location)
+        return acs_subject
 
-        subjectDict = subjectDict["variables"]
+    def _typed_frame(
+        self,
+        values: np.ndarray,
+        labels: pd.Index,
+        types: np.ndarray,
+        index: pd.Index,
+    ):
+        """Builds a dataframe from response values, typing columns by their predicateType
 
-        for idx, id in enumerate(ids):
-            subject = id
-            # Search for the subject ids in our JSON file
-            # try/catch so we only query query-able fields in the JSON
+        "float" variables become float32 and "int" variables become nullable Int64, with
+        Census sentinel values (CENSUS_SENTINELS) replaced by NaN. Other columns stay strings
+        """
+        is_num = np.isin(types, ["int", "float"])
+        block = values[:, is_num]
+        try:
+            nums = block.astype(np.float64)
+        except (TypeError, ValueError):  # Nulls or non-numeric strings in the response
+            nums = (
+                pd.DataFrame(block)
+                .apply(pd.to_numeric, errors="coerce")
+                .to_numpy(dtype=np.float64)
+            )
+        nums[np.isin(nums, CENSUS_SENTINELS)] = np.nan
+
+        num_labels = labels[is_num]
+        # Some "int" variables come back with decimals, keep those columns as floats
+        integral = np.all(np.isnan(nums) | (nums == np.round(nums)), axis=0)
+        is_int = (types[is_num] == "int") & integral
+
+        parts = [
+            pd.DataFrame(
+                nums[:, is_int], columns=num_labels[is_int], index=index
+            ).astype("Int64"),
+            pd.DataFrame(
+                nums[:, ~is_int].astype(np.float32),
+                columns=num_labels[~is_int],
+                index=index,
+            ),
+            pd.DataFrame(values[:, ~is_num], columns=labels[~is_num], index=index),
+        ]
+
+        return pd.concat(parts, axis=1)[labels]
+
+    def _match_rows(
+        self,
+        tableid: str,
+        year: Union[int, str],
+        ids: List[str],
+        rows: List[List[str]],
+        location: List[Dict[str, str]],
+    ):
+        """Returns the response rows in the same order as the batch of locations they were requested for"""
+        if len(location) == 1:  # Only one geography was requested
+            return rows[:1]
+
+        # Split the rows back out by matching the geography columns of the response
+        geo_cols = {"state": ["state"], "city": ["state", "place"]}
+        geo_cols["county"] = ["state", "county"]
+        level = self._geo_level(location[0])
+        col_idxs = [ids.index(col) for col in geo_cols[level]]
+        rows_by_geo = {tuple(row[i] for i in col_idxs): row for row in rows}
+
+        matched = []
+        for loc in location:
+            key = tuple(
+                loc["city"] if col == "place" else loc[col] for col in geo_cols[level]
+            )
             try:
-                concept_label.append(
-                    (
-                        subjectDict[subject]["concept"]
-                        + " "
-                        + subjectDict[subject]["label"]
-                    ).replace("!!", " ")
-                )
-                values.append(vals[idx])
+                matched.append(rows_by_geo[key])
             except KeyError:
-                continue
-
-        # Intermediate output DF
-        subject_df = pd.DataFrame(
-            {"concept_label": concept_label, "values": values, "year": year}
-        )
+                raise ValueError(
+                    f"Error: the ACS API did not return {tableid} for location {loc} in {year}"
+                )
 
-        # Drop duplicates
-        subject_df.drop_duplicates(inplace=True, subset=["concept_label"])
+        return matched
 
-        # Final DF that can be merged
-        acs_subject_pivoted = subject_df.pivot(
-            index="year", columns="concept_label", values="values"
-        )
+    def _project_rows(
+        self, ids: List[str], rows: List[List[str]], variables: List[str]
+    ):
+        """Keeps only the given variables of stored rows, or treats the rows as missing if a variable isn't stored"""
+        if ids is None or any(var not in ids for var in variables):
+            return None, [None] * len(rows)
 
-        acs_subject_pivoted.drop(acs_subject_pivoted.columns[0], axis=1, inplace=True)
+        positions = [ids.index(var) for var in variables]
+        rows = [
+            [row[p] for p in positions] if row is not None else None for row in rows
+        ]
+        return list(variables), rows
 
-        location_str = ""
+    async def _process_request(
+        self,
+        tableid: str,
+        year: Union[int, str],
+        location: List[Dict[str, str]],
+        tabletype: str = "detail",
+        estimate: Union[int, str] = "5",
+        varfile: str = "subject_vars_2019.json",
+        numeric: bool = False,
+        use_store: bool = True,
+        variables: List[str] = None,
+        debug: bool = False,
+    ):
+        """Requests one table for one year and a batch of locations, returning one row per location"""
+        survey = self.surveys[str(estimate)]
+        projected = variables is not None
 
-        if not location:  # If the location is empty
-            location_str = "us"
+        if debug:
+            print("loading variable definitions...")
+        # Parsed once per process and shared between requests
+        var_defs = load_var_defs(varfile)
+
+        # Locations that are already in the local store don't need to be fetched again
+        stored_ids, stored_rows = None, [None] * len(location)
+        if self.store is not None and use_store:
+            # Parquet reads and writes block, so they run in a thread off the event loop
+            stored_ids, stored_rows = await asyncio.get_running_loop().run_in_executor(
+                None,
+                functools.partial(
+                    self.store.read_rows,
+                    tableid=tableid,
+                    survey=survey,
+                    year=year,
+                    location=location,
+                ),
+            )
+            if projected:
+                stored_ids, stored_rows = self._project_rows(
+                    stored_ids, stored_rows, variables
+                )
 
-        for key, value in location_names.items():
-            if key.lower() != "state":
-                value = value.split(",")[0]
-            acs_subject_pivoted[key.lower()] = value.lower()
-            location_str += (
-                value.lower() if len(location_str) == 0 else " " + value.lower()
+        missing = [i for i, row in enumerate(stored_rows) if row is None]
+        if not missing:
+            if debug:
+                print(
+                    f"{tableid} {year}: read {len(location)} locations from the store"
+                )
+            return self._decode_response(
+                stored_ids,
+                stored_rows,
+                year,
+                location,
+                var_defs,
+                numeric=numeric,
+                projected=projected,
             )
 
-        acs_subject_pivoted["location_key"] = location_str
+        fetch = [location[i] for i in missing]
 
-        return acs_subject_pivoted
+        # Pulls data from ACS, in chunks of at most max_variables if we only want some variables
+        if debug:
+            print("making request...")
+        chunks = [None]
+        if projected:
+            chunks = [
+                variables[i : i + self.max_variables]
+                for i in range(0, len(variables), self.max_variables)
+            ]
+        resps = await asyncio.gather(
+            *[
+                self._collect_table(
+                    tableid=tableid,
+                    year=year,
+                    location=self._merge_batch(fetch),
+                    tabletype=tabletype,
+                    estimate=estimate,
+                    variables=chunk,
+                    debug=debug,
+                )
+                for chunk in chunks
+            ]
+        )
+
+        # ids: list of subject ids
+        # rows: one list of values per geography in the response
+        if debug:
+            print("post-processing....")
+        ids, rows = [], [[] for _ in fetch]
+        for resp in resps:
+            matched = self._match_rows(tableid, year, resp[0], resp[1:], fetch)
+            ids += resp[0]
+            for row, part in zip(rows, matched):
+                row += part
+
+        # Only whole tables are saved, so the store never has partial rows
+        if self.store is not None and not projected:
+            await asyncio.get_running_loop().run_in_executor(
+                None,
+                functools.partial(
+                    self.store.write,
+                    tableid=tableid,
+                    survey=survey,
+                    year=year,
+                    ids=ids,
+                    rows=rows,
+                    location=fetch,
+                ),
+            )
+
+        fetched = self._decode_response(
+            ids, rows, year, fetch, var_defs, numeric=numeric, projected=projected
+        )
+        if len(missing) == len(location):
+            return fetched
+
+        # Merge the stored and freshly fetched locations back into the requested order
+        have = [i for i, row in enumerate(stored_rows) if row is not None]
+        stored = self._decode_response(
+            stored_ids,
+            [stored_rows[i] for i in have],
+            year,
+            [location[i] for i in have],
+            var_defs,
+            numeric=numeric,
+            projected=projected,
+        )
+        order = have + missing
+        res = pd.concat([stored, fetched])
+        return res.iloc[sorted(range(len(order)), key=order.__getitem__)]
+
+    def _clean_location(self, location: Dict[str, str]):
+        """Splits the state code off of 7-digit city codes and [state]_[county] county codes"""
+        if "city" in location.keys():
+            if len(location["city"]) == 7:
+                if "state" not in location.keys():
+                    location["state"] = location["city"][
+                        0:2
+                    ]  # Add the state code to the state key
+                location["city"] = location["city"][2:]  # shave off the state code
+        if "county" in location.keys():  # Clean the county
+            if "_" in location["county"]:
+                splt = location["county"].split("_")
+                location["county"] = splt[-1]
+                if "state" not in location.keys():
+                    location["state"] = splt[0]
+        return location
 
     async def _tables_range(
         self,
         tableid: str,
-        location: Dict[str, str],
+        location: Union[Dict[str, str], List[Dict[str, str]]],
         start_year: Union[int, str] = "2015",
         end_year: Union[int, str] = "2019",
         tabletype: str = "detail",
         varfile: str = "subject_vars_2019.json",
         estimate: Union[int, str] = "5",
+        batch: bool = True,
+        numeric: bool = False,
+        use_store: bool = True,
+        variables: List[str] = None,
         debug: bool = False,
     ):
         """Helper function to get multiple years of ACS data for a single subject and return them as a single dataframe"""
         year_range = range(int(start_year), int(end_year) + 1)
 
+        if variables is not None:  # Turn label patterns into variable IDs
+            patterns = variables
+            variables = load_var_defs(varfile).resolve(tableid, patterns)
+            if debug:
+                print(f"{tableid}: requesting variables {variables}")
+            if not variables:
+                print(
+                    f"Warning: none of {patterns} matched a variable in {tableid}, requesting the whole table"
+                )
+                variables = None
+
         if isinstance(location, dict):  # If there is only one location passed
-            # Clean location
-            if "city" in location.keys():
-                if len(location["city"]) == 7:
-                    if "state" not in location.keys():
-                        location["state"] = location["city"][
-                            0:2
-                        ]  # Add the state code to the state key
-                    location["city"] = location["city"][2:]  # shave off the state code
-            if "county" in location.keys():  # Clean the county
-                if "_" in location["county"]:
-                    splt = location["county"].split("_")
-                    location["county"] = splt[-1]
-                    if "state" not in location.keys():
-                        location["state"] = splt[0]
-
-            results = await asyncio.gather(
-                *[
-                    self._process_request(
-                        tableid=tableid,
-                        year=year,
-                        location=location,
-                        tabletype=tabletype,
-                        estimate=estimate,
-                        varfile=varfile,
-                        debug=debug,
-                    )
-                    for year in year_range
-                ]
-            )
-        elif isinstance(location, list):  # If there is more than one location passed in
-            for loc in location:
-                if "city" in loc.keys():
-                    if len(loc["city"]) == 7:
-                        if "state" not in loc.keys():
-                            loc["state"] = loc["city"][
-                                0:2
-                            ]  # Add the state code to the state key
-                        loc["city"] = loc["city"][2:]  # shave off the state code
-                if "county" in loc.keys():  # Clean the county
-                    if "_" in loc["county"]:
-                        splt = loc["county"].split("_")
-                        loc["county"] = splt[-1]
-                        if "state" not in loc.keys():
-                            loc["state"] = splt[0]
-
-            results = await asyncio.gather(
-                *[
-                    self._process_request(
-                        tableid=tableid,
-                        year=year,
-                        location=loc,
-                        tabletype=tabletype,
-                        estimate=estimate,
-                        varfile=varfile,
-                        debug=debug,
-                    )
-                    for year in year_range
-                    for loc in location
-                ]
+            location = [location]
+
+        location = [self._clean_location(loc) for loc in location]
+
+        if batch:
+            batches = self._plan_batches(location)
+        else:
+            batches = [[i] for i in range(len(location))]
+
+        if debug:
+            print(
+                f"{tableid}: {len(batches) * len(year_range)} requests for {len(location)} locations"
             )
 
+        results = await asyncio.gather(
+            *[
+                self._process_request(
+                    tableid=tableid,
+                    year=year,
+                    location=[location[i] for i in idxs],
+                    tabletype=tabletype,
+                    estimate=estimate,
+                    varfile=varfile,
+                    numeric=numeric,
+                    use_store=use_store,
+                    variables=variables,
+                    debug=debug,
+                )
+                for year in year_range
+                for idxs in batches
+            ]
+        )
+
         res = pd.concat(results)
 
+        # Put the rows back in the order the locations were passed in, year by year
+        order = [
+            y * len(location) + i
+            for y in range(len(year_range))
+            for idxs in batches
+            for i in idxs
+        ]
+        res = res.iloc[sorted(range(len(order)), key=order.__getitem__)]
+
         return res
 
     async def get_acs(
@@ -386,6 +787,10 @@ class ACSClient(object):
         varfile: Union[str, List[str]] = None,
         estimate: Union[int, str] = "5",
         join: bool = False,
+        batch: bool = True,
+        numeric: bool = False,
+        use_store: bool = True,
+        variables: Union[List[str], Dict[str, List[str]]] = None,
         debug: bool = False,
     ):
         """get_acs queries the ACS API and gathers data for any subject or data table into pandas dataframes
@@ -428,6 +833,24 @@ class ACSClient(object):
             ACS estimates to gather (1, 3, or 5-year)
         join: bool, optional
             Whether or not to join all the results together into one large table, by default True
+        batch: bool, optional
+            Whether or not to request locations of the same type in the same state with one API call, by default True
+            For example, 9 cities in California are fetched with a single request per table and year
+        numeric: bool, optional
+            Whether or not to return typed columns instead of strings, by default False
+            Variables the Census marks as "int" become Int64 columns and "float" ones become float32,
+            with Census placeholder values for missing data (ex. -666666666) replaced by NaN
+        use_store: bool, optional
+            If the client has a local table store, whether or not to read (table, year, location) slices
+            that are already in it instead of fetching them again, by default True
+            Extending a pull from 2015-2019 to 2015-2021 then only requests 2020 and 2021
+            Pass False to refetch everything (the store is still updated)
+        variables: Union[List[str], Dict[str, List[str]]], optional
+            Only request these variables instead of whole tables, by default None (whole tables)
+            Entries can be variable IDs (ex. "S1501_C02_014E") or parts of the column names get_acs returns
+            (ex. "Population 25 years and over Bachelor's degree or higher"), matched case-insensitively.
+            Pass a dictionary like {"S1501": [...], "S2701": [...]} to pick variables per table;
+            a list is applied to every table
         debug: bool, optional
             If True, prints out extra information useful for debugging
 
@@ -455,6 +878,12 @@ class ACSClient(object):
             ]
             varfile = varfile[0] if len(varfile) == 1 else varfile
 
+        # Variables to request for each table, None meaning the whole table
+        if isinstance(variables, dict):
+            table_vars = [variables.get(table, None) for table in vars]
+        else:
+            table_vars = [variables] * len(vars)
+
         if isinstance(varfile, str):
             dfs = await asyncio.gather(
                 *[
@@ -466,9 +895,13 @@ class ACSClient(object):
                         tabletype=tabletypes[0],
                         estimate=estimate,
                         varfile=varfile,
+                        batch=batch,
+                        numeric=numeric,
+                        use_store=use_store,
+                        variables=table_vars[i],
                         debug=debug,
                     )
-                    for table in vars
+                    for i, table in enumerate(vars)
                 ]
             )
         elif isinstance(varfile, list):
@@ -482,6 +915,10 @@ class ACSClient(object):
                         tabletype=tabletypes[i],
                         varfile=varfile[i],
                         estimate=estimate,
+                        batch=batch,
+                        numeric=numeric,
+                        use_store=use_store,
+                        variables=table_vars[i],
                         debug=debug,
                     )
                     for i, table in enumerate(vars)
@@ -499,6 +936,106 @@ class ACSClient(object):
             return dfs[0] if len(dfs) == 1 else dfs
 
 
+# ACSClients shared by every SyncACSClient in the process, keyed by their arguments
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_shared_client(initialize_kwargs: dict = None, **kwargs) -> ACSClient:
+    """get_shared_client returns the process-wide ACSClient for a set of arguments
+
+    The client is created and initialized on the background event loop (see
+    lowe.utils.eventloop.get_loop) the first time it is asked for, and later calls with the
+    same arguments return it again, so they all reuse one aiohttp session and its connections.
+    Shared clients are closed by close_shared_clients, which runs when the process exits.
+
+    Parameters
+    ----------
+    initialize_kwargs : dict, optional
+        Keyword arguments for ACSClient.initialize, ex. {"max_in_flight": 20}, by default None
+    **kwargs
+        Keyword arguments for ACSClient, ex. key_env_name or store_dir
+
+    Returns
+    -------
+    ACSClient
+        Initialized client whose coroutines must be run on the background loop
+    """
+    key = json.dumps([kwargs, initialize_kwargs or {}], sort_keys=True, default=str)
+    with _shared_clients_lock:
+        client = _shared_clients.get(key, None)
+        if client is None:
+            loop = get_loop()
+            client = ACSClient(**kwargs)
+            loop.run(client.initialize(**(initialize_kwargs or {})))
+            if not _shared_clients:
+                # Registered after the loop, so it runs before the loop is stopped at exit
+                atexit.register(close_shared_clients)
+            _shared_clients[key] = client
+    return client
+
+
+def close_shared_clients():
+    """Closes the sessions of the shared clients. New ones are created on next use"""
+    with _shared_clients_lock:
+        clients = list(_shared_clients.values())
+        _shared_clients.clear()
+        if clients:
+            atexit.unregister(close_shared_clients)
+
+    loop = get_loop()
+    for client in clients:
+        if loop.loop.is_running():
+            loop.run(client.close())
+
+
+class SyncACSClient(object):
+    def __init__(self, initialize_kwargs: dict = None, **kwargs):
+        """the SyncACSClient class wraps ACSClient for code that isn't asynchronous
+
+        Every SyncACSClient made with the same arguments uses the same ACSClient (see
+        get_shared_client), which lives on a background event loop shared by the whole process,
+        so every call reuses the same warm connections. The shared session is closed when the
+        process exits, or by close_shared_clients().
+
+            client = SyncACSClient()
+            df = client.get_acs(vars=["S1501"], start_year=2019, end_year=2019, location={"state": "06"})
+
+        Parameters
+        ----------
+        initialize_kwargs : dict, optional
+            Keyword arguments for ACSClient.initialize, ex. {"max_in_flight": 20}, by default None
+        **kwargs
+            Keyword arguments for ACSClient, ex. key_env_name or store_dir
+        """
+        self._loop = get_loop()
+        self.client = get_shared_client(initialize_kwargs, **kwargs)
+
+    def get_acs(self, *args, **kwargs):
+        """Runs ACSClient.get_acs and returns its result. Takes the same arguments"""
+        if self.client is None:
+            raise RuntimeError("Error: this client has been closed.")
+        return self._loop.run(self.client.get_acs(*args, **kwargs))
+
+    def close(self):
+        """Stops using the shared client. Its session stays open for other SyncACSClients"""
+        self.client = None
+
+    def __getattr__(self, name: str):
+        # Everything else (stats, store, cache, ...) comes from the wrapped client.
+        # Looked up in __dict__ so this can't recurse before client is set
+        client = self.__dict__.get("client", None)
+        if client is None:
+            raise AttributeError(name)
+        return getattr(client, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
 """
 async def main():
     subjects = ["S2701"]
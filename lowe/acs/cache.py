@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from typing import Dict, Union
+
+
+class ResponseCache(object):
+    # Number of writes between full scans of the cache directory
+    EVICT_EVERY = 1000
+    # Fraction of max_size the cache is brought down to when it grows past it
+    EVICT_TO = 0.9
+
+    def __init__(
+        self,
+        cache_dir: str = None,
+        ttl: Union[int, float] = 30 * 24 * 60 * 60,
+        max_size: int = 500 * 1024 * 1024,
+    ):
+        """the ResponseCache class stores raw API responses on disk, keyed on the request they came from
+
+        Parameters
+        ----------
+        cache_dir : str, optional
+            Directory to store the cached responses in, by default "~/.cache/lowe/acs"
+        ttl : Union[int, float], optional
+            Number of seconds a cached response stays valid, by default 30 days
+            Pass None to keep responses until they are evicted for space
+        max_size : int, optional
+            Maximum size of the cache directory in bytes, by default 500 MB
+            When the cache grows past this, the least recently used responses are deleted
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "lowe", "acs")
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_size = max_size
+
+        # Running total of the size of the cache, so writes don't have to scan the directory.
+        # None until the first scan. Rescanned every EVICT_EVERY writes to drop expired entries
+        # and pick up entries written by other processes
+        self._size = None
+        self._writes = 0
+        # The cache is used from executor threads, so the running total is updated under a lock
+        self._lock = threading.RLock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, uri: str, params: Dict[str, str]) -> str:
+        """make_key hashes the request URI and parameters into a cache key
+
+        Parameters
+        ----------
+        uri : str
+            Base URI the request is sent to
+        params : Dict[str, str]
+            Query parameters of the request. The API key ("key") is left out of the hash
+            so that the same request made with different keys maps to the same entry
+
+        Returns
+        -------
+        str
+            Hex digest identifying the request
+        """
+        params = {k: v for k, v in params.items() if k != "key"}
+        raw = json.dumps([uri, params], sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key: str):
+        """Returns the cached response for key, or None if it is missing or expired"""
+        path = self._path(key)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        if self.ttl is not None and time.time() - mtime > self.ttl:
+            self.delete(key)
+            return None
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):  # Partially written or corrupt entry
+            self.delete(key)
+            return None
+
+        # Bump the access time so eviction drops the least recently used entries first
+        os.utime(path, (time.time(), mtime))
+        return data
+
+    def set(self, key: str, value):
+        """Writes value to the cache under key and evicts old entries if the cache is too big"""
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+
+        with self._lock:
+            old_size = self._file_size(path)
+            os.replace(tmp, path)  # Atomic, so readers never see half an entry
+
+            self._writes += 1
+            if self._size is None or self._writes >= self.EVICT_EVERY:
+                self.evict()
+                return
+
+            self._size += self._file_size(path) - old_size
+            if self.max_size is not None and self._size > self.max_size:
+                self.evict()
+
+    def _file_size(self, path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def delete(self, key: str):
+        path = self._path(key)
+        with self._lock:
+            size = self._file_size(path)
+            try:
+                os.remove(path)
+            except OSError:
+                return
+            if self._size is not None:
+                self._size = max(self._size - size, 0)
+
+    def clear(self):
+        """Deletes every entry in the cache"""
+        with self._lock:
+            for fname in os.listdir(self.cache_dir):
+                if fname.endswith(".json"):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, fname))
+                    except OSError:
+                        pass
+            self._size = None
+
+    def evict(self):
+        """Deletes expired entries, then the least recently used ones until the cache is back under max_size"""
+        with self._lock:
+            entries = []
+            now = time.time()
+            for fname in os.listdir(self.cache_dir):
+                if not fname.endswith(".json"):
+                    continue
+                path = os.path.join(self.cache_dir, fname)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if self.ttl is not None and now - st.st_mtime > self.ttl:
+                    try:
+                        os.remove(path)
+                    except OSError:  # Already removed, ex. by another process
+                        pass
+                    continue
+                entries.append((st.st_atime, st.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            self._size = total
+            self._writes = 0
+            if self.max_size is None or total <= self.max_size:
+                return
+
+            # Leave some room, so the next writes don't have to evict again right away
+            target = self.max_size * self.EVICT_TO
+            entries.sort()  # Oldest access time first
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+            self._size = total
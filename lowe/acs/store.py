@@ -0,0 +1,302 @@
+import glob
+import os
+import pandas as pd
+import threading
+import time
+import uuid
+
+from typing import Dict, List, Union
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed if you use a TableStore
+    pa = None
+
+
+def location_fips(location: Dict[str, str]) -> str:
+    """Returns a string that uniquely identifies a cleaned location dictionary, ex. "city:55254;state:06" """
+    if not location:
+        return "us"
+    return ";".join(f"{k}:{location[k]}" for k in sorted(location.keys()))
+
+
+def location_level(location: Dict[str, str]) -> str:
+    """Returns the geography level of a location dictionary, ex. "state", "city", or "county+msa+state" """
+    if not location:
+        return "us"
+    keys = sorted(k for k in location.keys() if k != "state")
+    return "+".join(keys) if len(keys) > 1 else (keys[0] if keys else "state")
+
+
+class TableStore(object):
+    # Number of batch files a partition can have before write compacts it
+    MAX_FILES = 64
+
+    def __init__(self, store_dir: str):
+        """the TableStore class keeps fetched ACS tables in a local Parquet dataset
+
+        Responses are stored as returned by the API (one column per variable ID, ex. "S0101_C01_001E")
+        plus location_fips and written_at columns, partitioned as
+            [store_dir]/survey=acs5/table=S0101/year=2019/level=city/part-*.parquet
+        so reads only open the years and geography levels they need. Each write adds a new
+        file to its partition instead of rewriting it, and the newest row of a location wins.
+        Partitions are compacted back into one file once they have MAX_FILES files.
+
+        Parameters
+        ----------
+        store_dir : str
+            Directory for the dataset. It is created if it does not exist
+        """
+        if pa is None:
+            raise ImportError(
+                "Error: the ACS table store needs pyarrow. Install it with `pip install pyarrow`."
+            )
+        self.store_dir = store_dir
+        # Keeps compaction from removing files that another thread is reading
+        self._lock = threading.RLock()
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def _table_dir(self, tableid: str, survey: str) -> str:
+        return os.path.join(self.store_dir, f"survey={survey}", f"table={tableid}")
+
+    def _slice_dir(self, tableid: str, survey: str, year: Union[int, str], level: str):
+        return os.path.join(
+            self._table_dir(tableid, survey), f"year={int(year)}", f"level={level}"
+        )
+
+    def _slice_files(self, slice_dir: str) -> List[str]:
+        # data.parquet is the single file of stores written before partitions had batch files
+        return sorted(glob.glob(os.path.join(slice_dir, "*.parquet")))
+
+    def _write_file(self, slice_dir: str, df: pd.DataFrame):
+        os.makedirs(slice_dir, exist_ok=True)
+        df = df.astype({c: "string" for c in df.columns if c != "written_at"})
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        path = os.path.join(
+            slice_dir, f"part-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.parquet"
+        )
+        tmp = f"{path}.{os.getpid()}.tmp"
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)  # Atomic, so readers never see half a file
+
+    def _latest(self, df: pd.DataFrame, keep_written: bool = False) -> pd.DataFrame:
+        """Keeps the newest row of each location (files without written_at are the oldest)"""
+        if "written_at" not in df.columns:
+            return df
+        df = df.assign(written_at=df["written_at"].fillna(0).astype("int64"))
+        df = df.sort_values("written_at", kind="stable")
+        keys = [c for c in ["year", "level", "location_fips"] if c in df.columns]
+        df = df.drop_duplicates(subset=keys, keep="last")
+        return df if keep_written else df.drop(columns="written_at")
+
+    def compact(
+        self,
+        tableid: str = None,
+        survey: str = None,
+        year: Union[int, str] = None,
+        level: str = None,
+    ):
+        """compact merges the batch files of partitions into one file each, keeping the newest rows
+
+        Parameters
+        ----------
+        tableid, survey, year, level : optional
+            Partition to compact. Any left as None match every stored value, so
+            store.compact() compacts the whole store
+        """
+        pattern = os.path.join(
+            self.store_dir,
+            f"survey={survey or '*'}",
+            f"table={tableid or '*'}",
+            f"year={int(year) if year is not None else '*'}",
+            f"level={level or '*'}",
+        )
+        with self._lock:
+            for slice_dir in glob.glob(pattern):
+                files = self._slice_files(slice_dir)
+                if len(files) < 2:
+                    continue
+                df = pd.concat([pd.read_parquet(f) for f in files], ignore_index=True)
+                df = self._latest(df, keep_written=True)
+                # The compacted file is written before the old ones are removed, and keeps
+                # written_at, so readers in other processes never miss or mix up rows
+                self._write_file(slice_dir, df)
+                for f in files:
+                    try:
+                        os.remove(f)
+                    except OSError:
+                        pass
+
+    def write(
+        self,
+        tableid: str,
+        survey: str,
+        year: Union[int, str],
+        ids: List[str],
+        rows: List[List[str]],
+        location: List[Dict[str, str]],
+    ):
+        """write stores the rows of one API response, replacing any stored rows for the same locations
+
+        The rows go in a new file of each partition, so writing doesn't depend on how much is
+        already stored. Partitions with MAX_FILES files are compacted
+
+        Parameters
+        ----------
+        tableid : str
+            Table the response is for, ex. "S0101"
+        survey : str
+            Survey the response is from, ex. "acs5"
+        year : Union[int, str]
+            Year of the response
+        ids : List[str]
+            Header row of the response
+        rows : List[List[str]]
+            Rows of the response, one per location and in the same order as location
+        location : List[Dict[str, str]]
+            Cleaned location dictionaries the rows correspond to
+        """
+        df = pd.DataFrame(rows, columns=ids, dtype=object)
+        df["location_fips"] = [location_fips(loc) for loc in location]
+        df["level"] = [location_level(loc) for loc in location]
+        df["written_at"] = time.time_ns()
+
+        for level, part in df.groupby("level", sort=False):
+            slice_dir = self._slice_dir(tableid, survey, year, level)
+            with self._lock:
+                self._write_file(slice_dir, part.drop(columns="level"))
+                if len(self._slice_files(slice_dir)) >= self.MAX_FILES:
+                    self.compact(tableid, survey, year, level)
+
+    def read(
+        self,
+        tableid: str,
+        survey: str = "acs5",
+        years: List[Union[int, str]] = None,
+        levels: List[str] = None,
+        locations: List[Dict[str, str]] = None,
+        columns: List[str] = None,
+    ) -> pd.DataFrame:
+        """read loads stored rows for a table, only reading the partitions and columns asked for
+
+        Parameters
+        ----------
+        tableid : str
+            Table to read, ex. "S0101"
+        survey : str, optional
+            Survey to read from, by default "acs5"
+        years : List[Union[int, str]], optional
+            Years to read, by default None (all stored years)
+        levels : List[str], optional
+            Geography levels to read, ex. ["city", "state"], by default None (all levels)
+        locations : List[Dict[str, str]], optional
+            Cleaned location dictionaries to read, by default None (all stored locations)
+        columns : List[str], optional
+            Variable IDs to read, ex. ["S0101_C01_001E"], by default None (all variables)
+
+        Returns
+        -------
+        pd.DataFrame
+            Stored rows with the requested variables plus "year", "level", and "location_fips".
+            Empty if nothing matches
+        """
+        with self._lock:
+            return self._read(tableid, survey, years, levels, locations, columns)
+
+    def _read(self, tableid, survey, years, levels, locations, columns):
+        files = glob.glob(
+            os.path.join(self._table_dir(tableid, survey), "*", "*", "*.parquet")
+        )
+        if not files:
+            return pd.DataFrame(columns=["year", "level", "location_fips"])
+
+        # Years can add or drop variables, so read with the union of all the file schemas.
+        # year and level come from the partition directories
+        schema = pa.unify_schemas([pq.read_schema(f) for f in files])
+        partitions = pa.schema([("year", pa.int32()), ("level", pa.string())])
+        dataset = ds.dataset(
+            files,
+            schema=pa.unify_schemas([schema, partitions]),
+            format="parquet",
+            partitioning=ds.partitioning(partitions, flavor="hive"),
+            partition_base_dir=self._table_dir(tableid, survey),
+        )
+
+        filters = []
+        if years is not None:
+            filters.append(ds.field("year").isin([int(y) for y in years]))
+        if levels is not None:
+            filters.append(ds.field("level").isin(list(levels)))
+        if locations is not None:
+            filters.append(
+                ds.field("location_fips").isin(
+                    [location_fips(loc) for loc in locations]
+                )
+            )
+
+        expr = None
+        for f in filters:
+            expr = f if expr is None else expr & f
+
+        if columns is not None:
+            columns = [c for c in columns if c in schema.names]
+            columns = columns + ["year", "level", "location_fips"]
+            if "written_at" in schema.names:
+                columns.append("written_at")
+
+        return self._latest(dataset.to_table(columns=columns, filter=expr).to_pandas())
+
+    def read_rows(
+        self,
+        tableid: str,
+        survey: str,
+        year: Union[int, str],
+        location: List[Dict[str, str]],
+    ):
+        """read_rows looks up stored response rows for a batch of locations of the same geography level
+
+        Parameters
+        ----------
+        tableid : str
+            Table to read, ex. "S0101"
+        survey : str
+            Survey to read from, ex. "acs5"
+        year : Union[int, str]
+            Year to read
+        location : List[Dict[str, str]]
+            Cleaned location dictionaries, all of the same geography level
+
+        Returns
+        -------
+        Tuple[List[str], List[List[str]]]
+            The stored header row (None if nothing is stored), and one row per location
+            in the same order as location, with None for locations that are not stored
+        """
+        slice_dir = self._slice_dir(tableid, survey, year, location_level(location[0]))
+        keys = [location_fips(loc) for loc in location]
+        with self._lock:
+            files = self._slice_files(slice_dir)
+            if not files:
+                return None, [None] * len(location)
+            df = pd.concat(
+                [
+                    pd.read_parquet(f, filters=[("location_fips", "in", keys)])
+                    for f in files
+                ],
+                ignore_index=True,
+            )
+        df = self._latest(df)
+
+        ids = [col for col in df.columns if col != "location_fips"]
+        values = df[ids].astype(object)
+        values = values.where(values.notna(), None).to_numpy().tolist()
+        rows_by_fips = dict(zip(df["location_fips"], values))
+
+        return ids, [rows_by_fips.get(key, None) for key in keys]
+
+    def stored_years(self, tableid: str, survey: str = "acs5") -> List[int]:
+        """Returns the years that have any rows stored for a table"""
+        dirs = glob.glob(os.path.join(self._table_dir(tableid, survey), "year=*"))
+        return sorted(int(os.path.basename(d).split("=")[1]) for d in dirs)
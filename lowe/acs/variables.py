@@ -0,0 +1,164 @@
+import json
+import numpy as np
+import pandas as pd
+import threading
+
+from typing import Dict, List, Tuple
+
+try:
+    import importlib.resources as pkg_resources
+except ImportError:
+    import importlib_resources as pkg_resources
+
+from . import tableids
+
+# Process-wide registry of parsed variable files, keyed on the varfile name.
+# Each file in tableids/ is parsed once and then shared by every ACSClient.
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class VariableDefinitions(object):
+    def __init__(self, variables: Dict[str, dict]):
+        """the VariableDefinitions class holds a parsed ACS variables.json file
+
+        Parameters
+        ----------
+        variables : Dict[str, dict]
+            The "variables" entry of an ACS variables.json file, mapping variable IDs
+            (ex. "DP05_0001E") to their metadata
+        """
+        # Human readable name of each variable, the same as the column names in get_acs
+        self.labels = {
+            varid: (var["concept"] + " " + var["label"]).replace("!!", " ")
+            for varid, var in variables.items()
+            if "concept" in var and "label" in var
+        }
+        self._labels = pd.Series(self.labels, dtype=object)
+
+        # predicateType of each variable ("int", "float", "string", ...), used for typed output
+        self.types = pd.Series(
+            {varid: var.get("predicateType", None) for varid, var in variables.items()},
+            dtype=object,
+        )
+
+        # Decoded response headers, since every response for a table has the same header
+        self._headers = {}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, varid: str):
+        return varid in self.labels
+
+    def decode_header(
+        self, ids: List[str], drop_first: bool = True
+    ) -> Tuple[np.ndarray, pd.Index, np.ndarray]:
+        """decode_header maps the header row of an ACS response to readable column names
+
+        Parameters
+        ----------
+        ids : List[str]
+            Header row of the response, ex. ["DP05_0001E", "DP05_0001M", ..., "state"]
+        drop_first : bool, optional
+            Whether or not to leave out the first column after sorting, by default True
+            Whole-table (group) responses start with a geography column that we don't want
+
+        Returns
+        -------
+        Tuple[np.ndarray, pd.Index, np.ndarray]
+            Positions of the header columns to keep, the column names for them, and their
+            predicateTypes. Columns without a definition are left out, only the first column
+            with a given name is kept, and the columns are sorted by name
+        """
+        key = (tuple(ids), drop_first)
+        decoded = self._headers.get(key, None)
+        if decoded is not None:
+            return decoded
+
+        labels = self._labels.reindex(ids).to_numpy()
+        found = pd.notna(labels)
+        keep = found & ~pd.Series(labels).where(found).duplicated().to_numpy()
+
+        positions = np.flatnonzero(keep)
+        labels = labels[keep]
+        order = np.argsort(labels, kind="stable")
+        if drop_first:
+            order = order[1:]
+
+        positions = positions[order]
+        decoded = (
+            positions,
+            pd.Index(labels[order], name="concept_label"),
+            self.types.reindex(np.asarray(ids, dtype=object)[positions]).to_numpy(),
+        )
+        self._headers[key] = decoded
+        return decoded
+
+    def resolve(self, tableid: str, variables: List[str]) -> List[str]:
+        """resolve turns a list of variable IDs and label patterns into the variable IDs they refer to
+
+        Parameters
+        ----------
+        tableid : str
+            Table the variables belong to, ex. "S1501"
+        variables : List[str]
+            Variable IDs (ex. "S1501_C02_014E") or parts of column names as returned by get_acs
+            (ex. "Percent AGE BY EDUCATIONAL ATTAINMENT Population 25 years and over Bachelor's degree or higher").
+            Column name patterns are matched case-insensitively against every variable in the table
+
+        Returns
+        -------
+        List[str]
+            Matching variable IDs of the table, without duplicates
+        """
+        prefix = tableid.upper() + "_"
+        table_labels = self._labels[self._labels.index.str.startswith(prefix)]
+
+        ids = []
+        for var in variables:
+            if var in self.labels:
+                matches = [var] if var.startswith(prefix) else []
+            else:
+                mask = table_labels.str.contains(var, case=False, regex=False)
+                matches = list(table_labels.index[mask.to_numpy(dtype=bool)])
+            for varid in matches:
+                if varid not in ids:
+                    ids.append(varid)
+        return ids
+
+
+def load_var_defs(varfile: str) -> VariableDefinitions:
+    """load_var_defs returns the parsed definitions for a variable file in lowe/acs/tableids/
+
+    The file is only read from disk the first time it is requested; later calls return
+    the same VariableDefinitions object.
+
+    Parameters
+    ----------
+    varfile : str
+        Name of the variable file, ex. "dprofile_vars_2019.json"
+
+    Returns
+    -------
+    VariableDefinitions
+        Parsed variable definitions
+    """
+    defs = _registry.get(varfile, None)
+    if defs is not None:
+        return defs
+
+    with _registry_lock:
+        defs = _registry.get(varfile, None)
+        if defs is None:  # Nobody else loaded it while we waited for the lock
+            with pkg_resources.open_text(tableids, varfile) as f:
+                defs = VariableDefinitions(json.load(f)["variables"])
+            _registry[varfile] = defs
+
+    return defs
+
+
+def clear_var_defs():
+    """Empties the registry so variable files are read from disk again on next use"""
+    with _registry_lock:
+        _registry.clear()
@@ -1,14 +1,123 @@
+import asyncio
+import aiohttp
+import backoff
 import json
+import numpy as np
 import os
 import pandas as pd
-import requests
 
+from aiolimiter import AsyncLimiter
 from dotenv import load_dotenv, find_dotenv
-from typing import Union, List
+from typing import Dict, Union, List, Tuple
+
+try:
+    import importlib.resources as pkg_resources
+except ImportError:
+    import importlib_resources as pkg_resources
+
+from .catalog import BLSCatalog
+from .quota import QuotaTracker
+
+
+def _count_retry(details: dict):
+    """backoff handler that counts retries on the client making the request"""
+    details["args"][0].stats["retries"] += 1
+
+
+def _count_giveup(details: dict):
+    """backoff handler that counts requests that failed after all retries"""
+    details["args"][0].stats["giveups"] += 1
+
+
+# For each kind of BLS period code (M01, Q01, S01, A01): the pandas frequency, the number
+# of periods in a year, and how pandas counts them (ordinal units per year and per period).
+# Half years (6M) are counted in months
+PERIOD_KINDS = {
+    "M": ("M", 12, 12, 1),
+    "Q": ("Q", 4, 4, 1),
+    "S": ("6M", 2, 12, 6),
+    "A": ("Y", 1, 1, 1),
+}
+
+
+def _period_index(ordinals: np.ndarray, freq: str) -> pd.PeriodIndex:
+    if hasattr(pd.PeriodIndex, "from_ordinals"):
+        return pd.PeriodIndex.from_ordinals(ordinals, freq=freq, name="period")
+    return pd.PeriodIndex(ordinal=ordinals, freq=freq, name="period")
+
+
+def parse_bls_series(data: List[dict], name: str = "value") -> pd.DataFrame:
+    """parse_bls_series turns the data of one series in a BLS API response into a dataframe
+
+    Period codes are mapped straight to periods: M01-M12 are months, Q01-Q04 quarters,
+    S01-S02 half years, and A01 years. Annual averages (M13, Q05, S03) are not periods of
+    the series' frequency, so they are left out of the rows and kept in
+    df.attrs["annual_average"] instead, as a dictionary of year to value (only returned by
+    the API if annualaverage=True).
+
+    Parameters
+    ----------
+    data : List[dict]
+        "data" entries of the series, ex. [{"year": "2021", "period": "M01", "value": "7.3", ...}]
+    name : str, optional
+        Name of the value column, by default "value"
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per period, sorted and indexed by a PeriodIndex named "period", with the float
+        value, "year" (int), "latest" (True for the latest observation), and "time" (start of the period)
+    """
+    years = np.array([int(item["year"]) for item in data], dtype=np.int64)
+    codes = [item["period"] for item in data]
+    kind = codes[0][0] if codes else "M"
+    if kind not in PERIOD_KINDS:
+        raise ValueError(f"Error: unknown BLS period code {codes[0]}.")
+    freq, per_year, units, step = PERIOD_KINDS[kind]
+
+    numbers = np.array([int(code[1:]) for code in codes], dtype=np.int64)
+    values = pd.to_numeric(
+        pd.Series([item["value"] for item in data], dtype=object), errors="coerce"
+    ).to_numpy(dtype=np.float64)
+    latest = np.array([item.get("latest", None) == "true" for item in data], dtype=bool)
+
+    ordinals = (years - 1970) * units + (numbers - 1) * step
+
+    average = numbers == per_year + 1
+    rows = np.flatnonzero(~average)
+    rows = rows[np.argsort(ordinals[rows], kind="stable")]
+
+    index = _period_index(ordinals[rows], freq)
+    df = pd.DataFrame(
+        {"year": years[rows], name: values[rows], "latest": latest[rows]}, index=index
+    )
+    df["time"] = index.to_timestamp()
+
+    rows = np.flatnonzero(average)
+    rows = rows[np.argsort(years[rows], kind="stable")]
+    # A plain dictionary, since pandas compares attrs when combining frames
+    df.attrs["annual_average"] = dict(zip(years[rows].tolist(), values[rows].tolist()))
+    return df
+
+
+def series_names() -> Dict[str, str]:
+    """Returns the name of every series in bls_series.json, ex. {"LAUCT065525400000003": "Unemployment Rate, Palm Springs"}"""
+    with pkg_resources.open_text("lowe.bls", "bls_series.json") as f:
+        bls_series = json.load(f)
+    return {
+        seriesid: f"{measure}, {area}"
+        for measure, areas in bls_series.items()
+        for area, seriesid in areas.items()
+    }
 
 
 class BLSClient(object):
-    def __init__(self, key_env_name: str = "API_KEY_BLS"):
+    def __init__(
+        self,
+        key_env_name: str = "API_KEY_BLS",
+        quota_path: str = None,
+        catalog_path: str = None,
+    ):
         """the BLS Client class provides methods for wrapping around the BLS client
 
         Parameters
@@ -16,6 +125,10 @@ class BLSClient(object):
         key_env_name : str, optional
             name of the environment variable in your .env
             file corresponding to your BLS API key, by default "API_KEY_BLS"
+        quota_path : str, optional
+            File that counts the requests made each day, by default "~/.cache/lowe/bls/quota.json"
+        catalog_path : str, optional
+            SQLite database of ingested bulk files, by default "~/.cache/lowe/bls/catalog.sqlite"
         """
         load_dotenv(find_dotenv())
         self.API_KEY = os.environ.get(key_env_name, None)
@@ -29,7 +142,183 @@ class BLSClient(object):
         self.header = {"Content-type": "application/json"}
         self.BASE_URL = "https://api.bls.gov/publicAPI/v2/timeseries/data/"
 
-    def get_bls(
+        # Most series and years the API accepts in one request. Requests without
+        # a registration key are limited to 25 series and 10 years
+        self.max_series = 50 if self.API_KEY is not None else 25
+        self.max_years = 20 if self.API_KEY is not None else 10
+
+        # Daily request quota: 500 with a registration key, 25 without
+        self.quota = QuotaTracker(
+            limit=500 if self.API_KEY is not None else 25, path=quota_path
+        )
+
+        # The bulk catalog is only created once it is used, see bulk
+        self._catalog_path = catalog_path
+        self._bulk = None
+
+        # Request counters, see initialize() for the limits that apply to requests
+        self.stats = {"requests": 0, "retries": 0, "giveups": 0}
+
+    @property
+    def bulk(self) -> BLSCatalog:
+        """Series and data ingested from BLS bulk files, see ingest_bulk()
+
+        The database is created the first time this is used, so clients that only call the API
+        don't touch it.
+        """
+        if self._bulk is None:
+            self._bulk = BLSCatalog(self._catalog_path)
+        return self._bulk
+
+    def ingest_bulk(self, path: str, debug: bool = False):
+        """ingest_bulk loads BLS bulk flat files so their series can be read with get_bls(local=True)
+
+        Download the files of a survey from https://download.bls.gov/pub/time.series/,
+        ex. la.series, la.area, la.measure, and the la.data.* files for LAUS. Ingested series
+        can be looked up with client.bulk.find_series().
+
+        Parameters
+        ----------
+        path : str
+            A downloaded file or a directory of them
+        debug : bool, optional
+            If True, prints out each file as it is ingested
+        """
+        self.bulk.ingest(path, debug=debug)
+
+    async def initialize(
+        self,
+        max_in_flight: int = 4,
+        rate_limit: float = 50,
+        rate_period: float = 10,
+        keepalive_timeout: float = 60,
+    ):
+        """initialize opens the aiohttp session used for requests and sets up rate limiting
+
+        Parameters
+        ----------
+        max_in_flight : int, optional
+            Maximum number of API requests waiting on a response at once, by default 4
+            This is also the number of connections kept open to api.bls.gov
+        rate_limit : float, optional
+            Number of requests allowed every rate_period seconds, by default 50 (BLS's limit)
+        rate_period : float, optional
+            Length of the rate limiting window in seconds, by default 10
+        keepalive_timeout : float, optional
+            Seconds to keep idle connections open for reuse, by default 60
+        """
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.limiter = AsyncLimiter(rate_limit, rate_period)
+
+        connector = aiohttp.TCPConnector(
+            limit=max_in_flight,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=300,
+        )
+        self.session = aiohttp.ClientSession(connector=connector, headers=self.header)
+
+    async def close(self):
+        if getattr(self, "session", None) is not None and not self.session.closed:
+            await self.session.close()
+
+    async def __aenter__(self):
+        """Lets the client be used as `async with BLSClient() as client:`, which closes the session at the end"""
+        await self.initialize()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _plan_requests(
+        self, seriesid: List[str], startyear: int, endyear: int
+    ) -> List[Tuple[List[str], int, int]]:
+        """_plan_requests splits series and years into chunks the API accepts
+
+        Parameters
+        ----------
+        seriesid : List[str]
+            Series to get data for
+        startyear : int
+            First year to get data for
+        endyear : int
+            Last year to get data for
+
+        Returns
+        -------
+        List[Tuple[List[str], int, int]]
+            (series, startyear, endyear) of each request, with at most max_series series
+            and max_years years each
+        """
+        series_chunks = [
+            seriesid[i : i + self.max_series]
+            for i in range(0, len(seriesid), self.max_series)
+        ]
+        year_chunks = [
+            (start, min(start + self.max_years - 1, endyear))
+            for start in range(startyear, endyear + 1, self.max_years)
+        ]
+        return [
+            (chunk, start, end) for chunk in series_chunks for start, end in year_chunks
+        ]
+
+    @backoff.on_exception(
+        backoff.expo,
+        (aiohttp.ClientError, aiohttp.ClientResponseError),
+        max_tries=5,
+        on_backoff=_count_retry,
+        on_giveup=_count_giveup,
+    )
+    async def _post(self, payload: dict) -> dict:
+        """Sends one request to the API and returns the series in the response"""
+        try:
+            assert self.session is not None
+        except AssertionError:
+            print(
+                "Error: Please initialize client \
+                   session with `client.initialize()`"
+            )
+
+        async with self.semaphore, self.limiter:
+            self.quota.take()
+            self.stats["requests"] += 1
+            async with self.session.post(
+                self.BASE_URL, data=json.dumps(payload), raise_for_status=True
+            ) as resp:
+                data_json = json.loads(await resp.text())
+
+        message = " ".join(data_json.get("message", []))
+        if "daily threshold" in message.lower():
+            self.quota.exhaust()  # BLS counts differently from us, so trust its answer
+
+        assert data_json["status"] == "REQUEST_SUCCEEDED", "Request Failed: " + message
+        return data_json["Results"]["series"]
+
+    async def _fetch(
+        self, payload: dict, seriesid: List[str], startyear: int, endyear: int
+    ) -> Dict[str, List[dict]]:
+        """Requests the data of every series in chunks the API accepts and stitches it back together"""
+        plan = self._plan_requests(seriesid, startyear, endyear)
+        payloads = [
+            {**payload, "seriesid": chunk, "startyear": str(start), "endyear": str(end)}
+            for chunk, start, end in plan
+        ]
+
+        if len(payloads) > self.quota.remaining:
+            print(
+                f"Warning: this call needs {len(payloads)} requests, but only "
+                f"{self.quota.remaining} are left in today's BLS quota."
+            )
+
+        responses = await asyncio.gather(*[self._post(p) for p in payloads])
+
+        # Stitch the year ranges of each series back together
+        data = {s: [] for s in seriesid}
+        for response in responses:
+            for series in response:
+                data[series["seriesID"]].extend(series["data"])
+        return data
+
+    async def get_bls(
         self,
         seriesid: Union[str, List[str]],
         startyear: str = "2011",
@@ -39,13 +328,19 @@ class BLSClient(object):
         calculations: bool = False,
         aspects: bool = False,
         valuename: Union[str, List[str]] = "value",
+        wide: bool = False,
+        local: bool = False,
     ) -> pd.DataFrame:
         """get_bls Gets data from the BLS API.
 
+        Any number of series and years can be requested: the call is split into requests of at
+        most max_series series and max_years years, which are sent concurrently. Each request
+        counts against the daily quota (see client.quota.remaining).
+
         Parameters
         ----------
         seriesid : Union[str, List[str]]
-            Series id(s) to get data from
+            Series id(s) to get data from. Case doesn't matter, and repeated ids are only requested once
         startyear : str, optional
             Year to start getting data from, by default "2011"
         endyear : str, optional
@@ -60,11 +355,20 @@ class BLSClient(object):
             [description], by default False
         valuename : str, optional
             Name to give the 'value' column in the result, by default 'value'
+        wide : bool, optional
+            If True, returns one dataframe indexed by period with a column of values per series,
+            by default False. Columns are named by valuename if it is a list, else by the name of
+            the series in bls_series.json (ex. "Unemployment Rate, Palm Springs") or its ID.
+            The series should all have the same frequency
+        local : bool, optional
+            If True, reads the series from bulk files ingested with client.ingest_bulk() instead
+            of calling the API, by default False
 
         Returns
         -------
-        pd.DataFrame
-            [description]
+        List[pd.DataFrame], pd.DataFrame
+            One dataframe per series, in the same order as seriesid. See parse_bls_series
+            for their format. If wide is True, one dataframe with a column per series instead
         """
         args = locals()
         valid_args = [
@@ -85,47 +389,53 @@ class BLSClient(object):
                 payload[k] = v
 
         payload["registrationkey"] = self.API_KEY
-        data = json.dumps(payload)
 
-        r = requests.post(url=self.BASE_URL, data=data, headers=self.header)
-        data_json = json.loads(r.text)
+        seriesid = [seriesid] if isinstance(seriesid, str) else list(seriesid)
+        # The API answers with uppercase IDs, and a series asked for twice is only fetched once
+        seriesid = [series.strip().upper() for series in seriesid]
+        unique = list(dict.fromkeys(seriesid))
 
-        # Process Result
+        if local:
+            # Read the ingested bulk files instead of calling the API
+            data = self.bulk.get_data(unique, startyear, endyear)
+        else:
+            data = await self._fetch(payload, unique, int(startyear), int(endyear))
 
-        assert data_json["status"] == "REQUEST_SUCCEEDED", "Request Failed"
+        # Process Result
 
-        seriesnames = [s["seriesID"] for s in data_json["Results"]["series"]]
+        if wide:
+            if isinstance(valuename, list):
+                names = valuename
+            else:
+                names_by_id = series_names()
+                names = [names_by_id.get(series, series) for series in seriesid]
+        elif isinstance(valuename, list):
+            names = valuename
+        else:
+            names = [valuename] * len(seriesid)
 
         dfs = []
 
-        for i, series in enumerate(seriesnames):
-            raw = data_json["Results"]["series"][i]
-            df = pd.json_normalize(raw, record_path="data")
-
-            df["time"] = df["periodName"] + " " + df["year"]
-            df["time"] = pd.to_datetime(df["time"])
-            df = df.sort_values(by="time", ascending=True)
+        for i, series in enumerate(seriesid):
+            if not data[series]:
+                print(f"Warning: no data was returned for series {series}")
 
-            df = df.drop(columns=["footnotes", "period", "periodName"])
+            dfs.append(parse_bls_series(data[series], name=names[i]))
 
-            if valuename != "value":
-                if isinstance(valuename, str):
-                    df.rename(columns={"value": valuename}, inplace=True)
-                elif isinstance(valuename, list):
-                    df.rename(columns={"value": valuename[i]}, inplace=True)
-
-            dfs.append(df)
+        if wide:
+            # One concat on the period index lines every series up
+            return pd.concat([df[name] for df, name in zip(dfs, names)], axis=1)
 
         return dfs
 
 
-def main():
-    client = BLSClient()
-    test = client.get_bls(
-        ["CUUR0000SA0", "SUUR0000SA0"], valuename=["test series 1", "test series 2"]
-    )
+async def main():
+    async with BLSClient() as client:
+        test = await client.get_bls(
+            ["CUUR0000SA0", "SUUR0000SA0"], valuename=["test series 1", "test series 2"]
+        )
     print(test)
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -0,0 +1,284 @@
+import glob
+import os
+import pandas as pd
+import sqlite3
+
+from contextlib import closing
+from typing import Dict, List, Union
+
+# Codes of the LAUS measures, see https://download.bls.gov/pub/time.series/la/la.measure
+LAUS_MEASURES = {
+    "unemployment rate": "03",
+    "unemployment": "04",
+    "employment": "05",
+    "labor force": "06",
+    "employment-population ratio": "07",
+    "labor force participation rate": "08",
+}
+
+# Columns of the {survey}.series files kept in the catalog. Surveys other than LAUS
+# don't have all of them, those are left empty
+SERIES_COLUMNS = [
+    "series_id",
+    "area_type_code",
+    "area_code",
+    "measure_code",
+    "seasonal",
+    "series_title",
+    "begin_year",
+    "begin_period",
+    "end_year",
+    "end_period",
+]
+
+
+CATALOG_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS series (
+    series_id TEXT PRIMARY KEY,
+    survey TEXT,
+    {", ".join(f"{col} TEXT" for col in SERIES_COLUMNS[1:])}
+);
+CREATE INDEX IF NOT EXISTS series_area_measure ON series (survey, area_code, measure_code);
+CREATE TABLE IF NOT EXISTS areas (
+    survey TEXT, area_code TEXT, area_text TEXT, PRIMARY KEY (survey, area_code)
+);
+CREATE TABLE IF NOT EXISTS measures (
+    survey TEXT, measure_code TEXT, measure_text TEXT, PRIMARY KEY (survey, measure_code)
+);
+CREATE TABLE IF NOT EXISTS data (
+    series_id TEXT, year INTEGER, period TEXT, value TEXT,
+    PRIMARY KEY (series_id, year, period)
+) WITHOUT ROWID;
+"""
+
+
+def laus_series_id(
+    location: Dict[str, str],
+    measure: str = "unemployment rate",
+    seasonal: bool = False,
+) -> str:
+    """laus_series_id builds the ID of a LAUS series from a location dictionary with FIPS values
+
+    Parameters
+    ----------
+    location : Dict[str, str]
+        Location dictionary with FIPS values, ex. {"state": "06", "city": "0655254"}
+        (see lowe.locations.lookup.name2fips). The most specific geography is used:
+        city, then county, then MSA, then state
+    measure : str, optional
+        Measure of the series, by default "unemployment rate"
+        Either a key of LAUS_MEASURES or a measure code like "03"
+    seasonal : bool, optional
+        Whether or not to use the seasonally adjusted series, by default False
+        Only states and some metro areas have seasonally adjusted series
+
+    Returns
+    -------
+    str
+        Series ID, ex. "LAUCT065525400000003"
+    """
+    measure = LAUS_MEASURES.get(measure.lower(), measure)
+    state = location.get("state", None)
+
+    if location.get("city", None) is not None:
+        area = f"CT{location['city']}000000"
+    elif location.get("county", None) is not None:
+        county = location["county"].split("_")[-1]
+        area = f"CN{state}{county}00000000"
+    elif location.get("msa", None) is not None:
+        area = f"MT{state}{location['msa']}000000"
+    else:
+        area = f"ST{state}00000000000"
+
+    if len(area) != 15:
+        raise ValueError(
+            f"Error: could not build a LAUS area code from {location}, pass FIPS codes with the state."
+        )
+    return f"LA{'S' if seasonal else 'U'}{area}{measure}"
+
+
+class BLSCatalog(object):
+    def __init__(self, db_path: str = None):
+        """the BLSCatalog class keeps series and data from BLS bulk files in a local SQLite database
+
+        The BLS publishes every series of a survey as flat files, ex. for LAUS at
+        https://download.bls.gov/pub/time.series/la/. Once ingested, series can be
+        looked up and their data read without using the API (or its daily quota).
+
+        Parameters
+        ----------
+        db_path : str, optional
+            Path of the database file, by default "~/.cache/lowe/bls/catalog.sqlite"
+        """
+        if db_path is None:
+            db_path = os.path.join(
+                os.path.expanduser("~"), ".cache", "lowe", "bls", "catalog.sqlite"
+            )
+        self.db_path = db_path
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.executescript(CATALOG_SCHEMA)
+
+    def _read_flat_file(self, path: str, chunksize: int = None):
+        """Reads a BLS flat file, which is tab separated with padded columns"""
+        chunks = pd.read_csv(
+            path, sep="\t", dtype=str, keep_default_na=False, chunksize=chunksize
+        )
+        for chunk in [chunks] if chunksize is None else chunks:
+            chunk.columns = chunk.columns.str.strip()
+            yield chunk.apply(lambda col: col.str.strip())
+
+    def ingest(self, path: str, chunksize: int = 500000, debug: bool = False):
+        """ingest loads BLS bulk flat files into the catalog
+
+        Rows that are already in the catalog are replaced, so newer files can be ingested
+        over older ones.
+
+        Parameters
+        ----------
+        path : str
+            A downloaded flat file, ex. "la/la.data.64.County", or a directory of them.
+            Files are recognized by name: {survey}.series, {survey}.area, {survey}.measure,
+            and {survey}.data.*
+        chunksize : int, optional
+            Number of rows of a data file to read at once, by default 500000
+        debug : bool, optional
+            If True, prints out each file as it is ingested
+        """
+        files = (
+            sorted(glob.glob(os.path.join(path, "*")))
+            if os.path.isdir(path)
+            else [path]
+        )
+
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            for fname in files:
+                parts = os.path.basename(fname).split(".")
+                if len(parts) < 2:
+                    continue
+                survey, kind = parts[0], parts[1]
+                if debug:
+                    print(f"Ingesting {fname}")
+
+                if kind == "series":
+                    for df in self._read_flat_file(fname):
+                        df = df.reindex(columns=SERIES_COLUMNS).astype(object)
+                        df = df.where(df.notna(), None)
+                        df.insert(1, "survey", survey)
+                        conn.executemany(
+                            f"INSERT OR REPLACE INTO series VALUES ({', '.join('?' * df.shape[1])})",
+                            df.itertuples(index=False, name=None),
+                        )
+                elif kind in ("area", "measure"):
+                    for df in self._read_flat_file(fname):
+                        rows = df[[f"{kind}_code", f"{kind}_text"]]
+                        conn.executemany(
+                            f"INSERT OR REPLACE INTO {kind}s VALUES (?, ?, ?)",
+                            (
+                                (survey, code, text)
+                                for code, text in rows.itertuples(index=False)
+                            ),
+                        )
+                elif kind == "data":
+                    for df in self._read_flat_file(fname, chunksize=chunksize):
+                        rows = df[["series_id", "year", "period", "value"]].astype(
+                            {"year": int}
+                        )
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO data VALUES (?, ?, ?, ?)",
+                            rows.itertuples(index=False, name=None),
+                        )
+
+    def find_series(
+        self,
+        survey: str = "la",
+        area_code: Union[str, List[str]] = None,
+        area_text: str = None,
+        measure: str = None,
+        seasonal: bool = None,
+    ) -> pd.DataFrame:
+        """find_series looks up ingested series by area and measure
+
+        Parameters
+        ----------
+        survey : str, optional
+            Survey the series belong to, by default "la" (LAUS)
+        area_code : Union[str, List[str]], optional
+            Area code(s) of the series, ex. "CT0655254000000", by default None (any area)
+        area_text : str, optional
+            Part of the area name, ex. "Palm Springs", by default None (any area)
+        measure : str, optional
+            Measure code or name, ex. "03" or "unemployment rate", by default None (any measure)
+        seasonal : bool, optional
+            Only return seasonally adjusted (True) or unadjusted (False) series, by default None (both)
+
+        Returns
+        -------
+        pd.DataFrame
+            Matching series, indexed by series ID, with the area and measure names
+        """
+        where, params = ["s.survey = ?"], [survey]
+        if area_code is not None:
+            area_code = [area_code] if isinstance(area_code, str) else list(area_code)
+            where.append(f"s.area_code IN ({', '.join('?' * len(area_code))})")
+            params += area_code
+        if area_text is not None:
+            where.append("a.area_text LIKE ?")
+            params.append(f"%{area_text}%")
+        if measure is not None:
+            where.append("(s.measure_code = ? OR m.measure_text LIKE ?)")
+            params += [LAUS_MEASURES.get(measure.lower(), measure), measure]
+        if seasonal is not None:
+            where.append("s.seasonal = ?")
+            params.append("S" if seasonal else "U")
+
+        query = f"""
+            SELECT s.*, a.area_text, m.measure_text FROM series s
+            LEFT JOIN areas a ON a.survey = s.survey AND a.area_code = s.area_code
+            LEFT JOIN measures m ON m.survey = s.survey AND m.measure_code = s.measure_code
+            WHERE {" AND ".join(where)}
+        """
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            return pd.read_sql_query(query, conn, params=params, index_col="series_id")
+
+    def get_data(
+        self,
+        seriesid: List[str],
+        startyear: Union[int, str] = None,
+        endyear: Union[int, str] = None,
+    ) -> Dict[str, List[dict]]:
+        """get_data reads the ingested data of some series
+
+        Parameters
+        ----------
+        seriesid : List[str]
+            Series to read
+        startyear : Union[int, str], optional
+            First year to read, by default None (the start of each series)
+        endyear : Union[int, str], optional
+            Last year to read, by default None (the end of each series)
+
+        Returns
+        -------
+        Dict[str, List[dict]]
+            Data of each series in the same format as the API, ex.
+            {"LAUCT065525400000003": [{"year": "2021", "period": "M01", "value": "9.1"}, ...]}
+        """
+        data = {s: [] for s in seriesid}
+        query = "SELECT year, period, value FROM data WHERE series_id = ?"
+        bounds = []
+        if startyear is not None:
+            query += " AND year >= ?"
+            bounds.append(int(startyear))
+        if endyear is not None:
+            query += " AND year <= ?"
+            bounds.append(int(endyear))
+
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            for s in seriesid:
+                for year, period, value in conn.execute(query, [s] + bounds):
+                    data[s].append(
+                        {"year": str(year), "period": period, "value": value}
+                    )
+        return data
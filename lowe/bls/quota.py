@@ -0,0 +1,87 @@
+import datetime
+import json
+import os
+import threading
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9, count days in UTC instead
+    ZoneInfo = None
+
+
+class QuotaExceededError(Exception):
+    pass
+
+
+class QuotaTracker(object):
+    def __init__(self, limit: int, path: str = None):
+        """the QuotaTracker class counts the BLS API requests made each day
+
+        The count is saved to disk, so it carries over between scripts run on the same day.
+        The file is only created once a request is counted. BLS quotas reset at midnight Eastern time.
+
+        Parameters
+        ----------
+        limit : int
+            Number of requests allowed per day, 500 with a registration key and 25 without
+        path : str, optional
+            File to keep the count in, by default "~/.cache/lowe/bls/quota.json"
+        """
+        if path is None:
+            path = os.path.join(
+                os.path.expanduser("~"), ".cache", "lowe", "bls", "quota.json"
+            )
+        self.limit = limit
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _today(self) -> str:
+        tz = ZoneInfo("America/New_York") if ZoneInfo is not None else None
+        return datetime.datetime.now(tz).strftime("%Y-%m-%d")
+
+    def _read(self) -> int:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        return data["used"] if data.get("date", None) == self._today() else 0
+
+    def _write(self, used: int):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"date": self._today(), "used": used}, f)
+        os.replace(tmp, self.path)
+
+    @property
+    def used(self) -> int:
+        """Number of requests made today"""
+        return self._read()
+
+    @property
+    def remaining(self) -> int:
+        """Number of requests left today"""
+        return max(self.limit - self._read(), 0)
+
+    def take(self, n: int = 1):
+        """take counts n requests against today's quota
+
+        Raises
+        ------
+        QuotaExceededError
+            If there aren't n requests left today. Nothing is counted in that case
+        """
+        with self._lock:
+            used = self._read()
+            if used + n > self.limit:
+                raise QuotaExceededError(
+                    f"Error: the daily BLS quota of {self.limit} requests has been used up "
+                    f"({used} made today). It resets at midnight Eastern time."
+                )
+            self._write(used + n)
+
+    def exhaust(self):
+        """Marks today's quota as used up, ex. when the API says we went over it"""
+        with self._lock:
+            self._write(self.limit)
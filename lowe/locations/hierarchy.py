@@ -0,0 +1,529 @@
+from __future__ import annotations  # Annotations like pd.DataFrame would load pandas
+
+import json
+import os
+import threading
+import unicodedata
+
+from lowe.utils.lazy import lazy_import
+from typing import Union
+
+try:
+    import importlib.resources as pkg_resources
+except ImportError:
+    import importlib_resources as pkg_resources
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Geography levels, from the largest to the smallest
+LEVELS = ["state", "msa", "county", "city"]
+
+# Geography indexes loaded by load_hierarchy, shared by every query in the process
+_hierarchy = {}
+_hierarchy_lock = threading.Lock()
+
+
+def _csr(n: int, src: np.ndarray, dst: np.ndarray):
+    """Groups the edges src -> dst by src, so the targets of node i are dst[offsets[i]:offsets[i + 1]]"""
+    order = np.argsort(src, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(src, minlength=n))])
+    return offsets.astype(np.int64), dst[order].astype(np.int32)
+
+
+class GeographyIndex(object):
+    def __init__(
+        self,
+        levels: np.ndarray,
+        fips: np.ndarray,
+        names: np.ndarray,
+        parent_offsets: np.ndarray,
+        parent_ids: np.ndarray,
+        source: str = "",
+    ):
+        """the GeographyIndex class answers questions about which geographies contain which
+
+        Geographies are nodes identified by their level ("state", "msa", "county", "city") and
+        FIPS code, in the same formats as the lookups (ex. county "06_065", city "0655254").
+        Each node links to the geographies directly containing it:
+            msa -> the states its counties are in
+            county -> its state, and its MSA if it is in one
+            city -> its state, and its county if it is in an MSA county
+        Links are kept as adjacency arrays in both directions, so the parents or children of
+        a node are a single slice. Use GeographyIndex.build to make one from the datasets.
+
+        Parameters
+        ----------
+        levels : np.ndarray
+            Position of the level of each node in LEVELS
+        fips : np.ndarray
+            FIPS code of each node
+        names : np.ndarray
+            Name of each node, in the same format as the lookups
+        parent_offsets : np.ndarray
+            Parents of node i are parent_ids[parent_offsets[i]:parent_offsets[i + 1]]
+        parent_ids : np.ndarray
+            Positions of the parents of each node
+        source : str, optional
+            Description of the data the index was built from, used to tell if it is out of date
+        """
+        self.levels = levels
+        self.fips = fips
+        self.names = names
+        self.parent_offsets = parent_offsets
+        self.parent_ids = parent_ids
+        self.source = source
+
+        counts = np.diff(parent_offsets)
+        nodes = np.repeat(np.arange(len(levels)), counts)
+        self.child_offsets, self.child_ids = _csr(len(levels), parent_ids, nodes)
+        self._ids = {
+            (LEVELS[level], code): i
+            for i, (level, code) in enumerate(zip(levels.tolist(), fips.tolist()))
+        }
+
+    @classmethod
+    def build(
+        cls,
+        cbsas_path: str = None,
+        cities_path: str = None,
+        place_counties: Union[str, pd.DataFrame] = None,
+        source: str = "",
+    ) -> GeographyIndex:
+        """build makes a geography index from the CBSA delineation and place gazetteer files
+
+        Parameters
+        ----------
+        cbsas_path : str, optional
+            CBSA delineation file, by default lowe/locations/datasets/cbsas.csv
+        cities_path : str, optional
+            Places gazetteer file, by default lowe/locations/datasets/city_geoids.csv
+        place_counties : Union[str, pd.DataFrame], optional
+            Links from places to the counties they are in, by default lowe/locations/datasets/place_counties.csv
+            A CSV file or DataFrame with "city" (7-digit) and "county" ([state]_[county]) FIPS columns.
+            A place in several counties can have a row for each. The default file links each place
+            to one county, see generate_place_counties. Pass an empty DataFrame to only link places
+            to their state
+        source : str, optional
+            Description of the data, saved with the index
+        """
+        from lowe.locations.lookup import load_decoder_tables
+
+        if cbsas_path is None:
+            with pkg_resources.path("lowe.locations.datasets", "cbsas.csv") as path:
+                cbsas_path = str(path)
+        if cities_path is None:
+            with pkg_resources.path(
+                "lowe.locations.datasets", "city_geoids.csv"
+            ) as path:
+                cities_path = str(path)
+        if place_counties is None:
+            with pkg_resources.path(
+                "lowe.locations.datasets", "place_counties.csv"
+            ) as path:
+                place_counties = str(path)
+
+        cities, counties, msas, states = load_decoder_tables(convert_to_bidict=False)
+        cbsas = pd.read_csv(cbsas_path, skipfooter=4, engine="python", dtype=str)
+        places = pd.read_csv(cities_path, dtype=str, encoding="utf-8-sig")
+        places.columns = places.columns.str.strip()
+
+        cbsas["state"] = cbsas["FIPS State Code"].str.zfill(2)
+        cbsas["county"] = cbsas["state"] + "_" + cbsas["FIPS County Code"].str.zfill(3)
+        cbsas["msa"] = cbsas["CBSA Code"]
+        places["city"] = places["GEOID"].str.zfill(7)
+        places["state"] = places["city"].str[:2]
+
+        # Names of places missing from the decoder (duplicate names are dropped there)
+        place_names = (
+            places["NAME"].str.rsplit(" ", n=1).str[0] + ", " + places["USPS"]
+        ).str.lower()
+        names = {
+            "state": states,
+            "msa": msas,
+            "county": counties,
+            "city": {**dict(zip(places["city"], place_names)), **cities},
+        }
+
+        nodes = {
+            "state": sorted(set(states) | set(cbsas["state"]) | set(places["state"])),
+            "msa": sorted(set(cbsas["msa"])),
+            "county": sorted(set(cbsas["county"])),
+            "city": sorted(set(places["city"])),
+        }
+        ids = {}
+        for level in LEVELS:
+            for code in nodes[level]:
+                ids[(level, code)] = len(ids)
+
+        edges = set()
+        for state, msa, county in zip(cbsas["state"], cbsas["msa"], cbsas["county"]):
+            edges.add((ids[("msa", msa)], ids[("state", state)]))
+            edges.add((ids[("county", county)], ids[("state", state)]))
+            edges.add((ids[("county", county)], ids[("msa", msa)]))
+        for city, state in zip(places["city"], places["state"]):
+            edges.add((ids[("city", city)], ids[("state", state)]))
+
+        if isinstance(place_counties, str):
+            place_counties = pd.read_csv(place_counties, dtype=str)
+        for city, county in zip(place_counties["city"], place_counties["county"]):
+            if ("city", city) in ids and ("county", county) in ids:
+                edges.add((ids[("city", city)], ids[("county", county)]))
+            else:
+                print(f"Warning: skipping unknown place {city} or county {county}")
+
+        edges = np.array(sorted(edges), dtype=np.int64).reshape(-1, 2)
+        parent_offsets, parent_ids = _csr(len(ids), edges[:, 0], edges[:, 1])
+        keys = list(ids)
+        return cls(
+            levels=np.array([LEVELS.index(level) for level, _ in keys], dtype=np.int8),
+            fips=np.array([code for _, code in keys], dtype=str),
+            names=np.array(
+                [
+                    name if isinstance(name, str) else ""
+                    for name in (names[level].get(code, None) for level, code in keys)
+                ],
+                dtype=str,
+            ),
+            parent_offsets=parent_offsets,
+            parent_ids=parent_ids,
+            source=source,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> GeographyIndex:
+        """Loads an index saved with GeographyIndex.save"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                levels=data["levels"],
+                fips=data["fips"],
+                names=data["names"],
+                parent_offsets=data["parent_offsets"],
+                parent_ids=data["parent_ids"],
+                source=str(data["source"]),
+            )
+
+    def save(self, path: str):
+        """Saves the index to path (a .npz file)"""
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                levels=self.levels,
+                fips=self.fips,
+                names=self.names,
+                parent_offsets=self.parent_offsets,
+                parent_ids=self.parent_ids,
+                source=np.array(self.source),
+            )
+
+    def _id(self, level: str, fips: str) -> int:
+        try:
+            return self._ids[(level.lower(), fips)]
+        except KeyError:
+            raise KeyError(f"Error: there is no {level} with FIPS code {fips!r}.")
+
+    def _frame(self, ids: np.ndarray, of_level: str = None) -> pd.DataFrame:
+        ids = np.asarray(ids, dtype=np.int64)
+        if of_level is not None:
+            ids = ids[self.levels[ids] == LEVELS.index(of_level.lower())]
+        return pd.DataFrame(
+            {
+                "level": np.array(LEVELS)[self.levels[ids]],
+                "fips": self.fips[ids],
+                "name": self.names[ids],
+            }
+        )
+
+    def _walk(self, start: int, offsets: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """Returns every node reachable from start, breadth first"""
+        seen = np.zeros(len(self.levels), dtype=bool)
+        frontier = np.array([start])
+        found = []
+        while len(frontier):
+            nxt = np.concatenate(
+                [targets[offsets[i] : offsets[i + 1]] for i in frontier]
+            )
+            nxt = np.unique(nxt[~seen[nxt]])
+            seen[nxt] = True
+            found.append(nxt)
+            frontier = nxt
+        return np.concatenate(found)
+
+    def parents(self, level: str, fips: str, of_level: str = None) -> pd.DataFrame:
+        """parents returns the geographies directly containing a geography
+
+        Parameters
+        ----------
+        level : str
+            Level of the geography, ex. "county"
+        fips : str
+            FIPS code of the geography, ex. "06_065"
+        of_level : str, optional
+            Only return parents of this level, by default None (all)
+
+        Returns
+        -------
+        pd.DataFrame
+            Parents with "level", "fips", and "name" columns
+        """
+        i = self._id(level, fips)
+        ids = self.parent_ids[self.parent_offsets[i] : self.parent_offsets[i + 1]]
+        return self._frame(ids, of_level)
+
+    def children(self, level: str, fips: str, of_level: str = None) -> pd.DataFrame:
+        """children returns the geographies directly inside a geography, ex. the counties of an MSA
+
+        Takes the same parameters and returns the same columns as parents
+        """
+        i = self._id(level, fips)
+        ids = self.child_ids[self.child_offsets[i] : self.child_offsets[i + 1]]
+        return self._frame(ids, of_level)
+
+    def ancestors(self, level: str, fips: str, of_level: str = None) -> pd.DataFrame:
+        """ancestors returns every geography containing a geography, ex. the county, MSA, and state of a place
+
+        Takes the same parameters and returns the same columns as parents
+        """
+        ids = self._walk(self._id(level, fips), self.parent_offsets, self.parent_ids)
+        return self._frame(ids, of_level)
+
+    def descendants(self, level: str, fips: str, of_level: str = None) -> pd.DataFrame:
+        """descendants returns every geography inside a geography
+
+        Example: all places in the Riverside MSA
+            index.descendants("msa", "40140", of_level="city")
+
+        Takes the same parameters and returns the same columns as parents.
+        Warns if no geography of of_level is inside it, ex. places of an MSA when the index
+        has no place-to-county links (see build)
+        """
+        ids = self._walk(self._id(level, fips), self.child_offsets, self.child_ids)
+        frame = self._frame(ids, of_level)
+        if of_level is not None and frame.empty:
+            print(
+                f"Warning: no {of_level} is inside {level} {fips}. "
+                f"{of_level} may not be linked to {level} in this index, see GeographyIndex.build"
+            )
+        return frame
+
+    def rollup(
+        self, data: pd.Series, level: str, to: str, agg: str = "sum"
+    ) -> pd.Series:
+        """rollup aggregates data about geographies to the geographies containing them
+
+        Example: total employment by county from employment by city
+            index.rollup(city_employment, level="city", to="county")
+
+        Parameters
+        ----------
+        data : pd.Series
+            Values indexed by the FIPS codes of the geographies
+        level : str
+            Level of the geographies in data, ex. "city"
+        to : str
+            Level to aggregate to, ex. "county"
+        agg : str, optional
+            Aggregation to use, by default "sum". Anything pd.core.groupby.SeriesGroupBy.agg takes
+
+        Returns
+        -------
+        pd.Series
+            Aggregated values indexed by the FIPS codes of the containing geographies.
+            Values of geographies not inside one of that level are left out with a warning
+
+        Raises
+        ------
+        ValueError
+            If none of the geographies in data are inside one of that level
+        """
+        target = LEVELS.index(to.lower())
+        containing = {}
+        for code in pd.unique(data.index):
+            ids = self._walk(
+                self._id(level, code), self.parent_offsets, self.parent_ids
+            )
+            ids = ids[self.levels[ids] == target]
+            containing[code] = self.fips[ids[0]] if len(ids) else None
+
+        missing = [code for code, parent in containing.items() if parent is None]
+        if containing and len(missing) == len(containing):
+            raise ValueError(
+                f"Error: none of the {level} values are inside a {to}. "
+                f"{level} may not be linked to {to} in this index, see GeographyIndex.build"
+            )
+        if missing:
+            print(
+                f"Warning: leaving out {len(missing)} {level} values not inside a {to}, "
+                f"ex. {missing[0]}"
+            )
+
+        keys = data.index.map(containing)
+        return data.groupby(keys.rename(to.lower()), dropna=True).agg(agg)
+
+
+def _county_key(name: str) -> str:
+    """Normalizes a county name so the CBSA file and the ZIP code data agree, ex. "Doña Ana County" -> "dona ana county" """
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    name = " ".join(name.lower().replace(".", "").split())
+    # The only county equivalent the two name differently
+    return name.replace("city and borough of juneau", "juneau city and borough")
+
+
+def generate_place_counties(
+    zips: pd.DataFrame = None, directory: str = None
+) -> pd.DataFrame:
+    """generate_place_counties makes datasets/place_counties.csv, the county each place is in
+
+    Neither the CBSA file nor the places gazetteer says which county a place is in, so each
+    place gets the county of a nearby ZIP code: the ZIP code closest to the place's
+    INTPTLAT/INTPTLONG point among those in its state named after the place (ex. the
+    "San Francisco" ZIP codes for San Francisco), or among all of its state's if none are.
+    Counties are matched by name within the state. Places whose county isn't in an MSA
+    (and so isn't in the CBSA file) are left out.
+
+    This is an approximation: a place in several counties only gets one, and places near
+    a county line can get the neighbouring county. The Census place-to-county relationship
+    file is exact and can be passed to GeographyIndex.build instead.
+
+    Parameters
+    ----------
+    zips : pd.DataFrame, optional
+        ZIP codes with "state" (ex. "CA"), "city", "county" (ex. "Riverside County"), "lat",
+        and "long" columns. By default the active standard and PO box ZIP codes of the
+        zipcodes package (`pip install zipcodes`), which the shipped file was made from
+    directory : str, optional
+        Directory with the datasets folder, by default lowe/locations
+
+    Returns
+    -------
+    pd.DataFrame
+        The "city" and "county" FIPS codes written to datasets/place_counties.csv
+    """
+    if zips is None:
+        try:
+            import zipcodes
+        except ImportError:
+            raise ImportError(
+                "Error: pass zips or install the zipcodes package with `pip install zipcodes`."
+            )
+        zips = pd.DataFrame(zipcodes.list_all())
+        usable = zips["active"] & zips["zip_code_type"].isin(["STANDARD", "PO BOX"])
+        located = zips[["lat", "county"]].fillna("").ne("").all(axis=1)
+        zips = zips[usable & located]
+    if directory is None:
+        from lowe.locations import datasets
+
+        directory = os.path.dirname(os.path.dirname(os.path.abspath(datasets.__file__)))
+    datasets = os.path.join(directory, "datasets")
+
+    cbsas = pd.read_csv(
+        os.path.join(datasets, "cbsas.csv"), skipfooter=4, engine="python", dtype=str
+    )
+    cbsas["state"] = cbsas["FIPS State Code"].str.zfill(2)
+    cbsas["county"] = cbsas["state"] + "_" + cbsas["FIPS County Code"].str.zfill(3)
+    counties = {
+        (state, _county_key(name)): county
+        for state, name, county in zip(
+            cbsas["state"], cbsas["County/County Equivalent"], cbsas["county"]
+        )
+    }
+
+    places = pd.read_csv(
+        os.path.join(datasets, "city_geoids.csv"), dtype=str, encoding="utf-8-sig"
+    )
+    places.columns = places.columns.str.strip()
+    places["city"] = places["GEOID"].str.zfill(7)
+    places["name"] = places["NAME"].str.rsplit(" ", n=1).str[0].str.lower()
+    places["lat"] = places["INTPTLAT"].astype(float)
+    places["long"] = places["INTPTLONG"].str.strip().astype(float)
+
+    zips = zips.assign(
+        lat=zips["lat"].astype(float),
+        long=zips["long"].astype(float),
+        city=zips["city"].str.lower(),
+        county=zips["county"].map(_county_key),
+    )
+
+    rows = []
+    for usps, group in places.groupby("USPS"):
+        in_state = zips[zips["state"] == usps]
+        if in_state.empty:
+            continue
+        lat, long = in_state["lat"].to_numpy(), in_state["long"].to_numpy()
+        names, zip_counties = in_state["city"].to_numpy(), in_state["county"].to_numpy()
+        for city, name, y, x in zip(
+            group["city"], group["name"], group["lat"], group["long"]
+        ):
+            # Squared distances on a plane, with longitude shrunk toward the poles
+            dist = (lat - y) ** 2 + ((long - x) * np.cos(np.radians(y))) ** 2
+            named = names == name
+            if named.any():
+                dist = np.where(named, dist, np.inf)
+            county = counties.get((city[:2], zip_counties[np.argmin(dist)]), None)
+            if county is not None:
+                rows.append((city, county))
+
+    res = pd.DataFrame(rows, columns=["city", "county"]).sort_values("city")
+    res.to_csv(os.path.join(datasets, "place_counties.csv"), index=False)
+    return res
+
+
+def load_hierarchy(cache_dir: str = None) -> GeographyIndex:
+    """load_hierarchy returns the geography index of the datasets in lowe/locations/datasets
+
+    The index is saved to cache_dir the first time it is built and rebuilt when the datasets
+    change. Within a process, the loaded index is shared.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        Directory to keep the index in, by default "~/.cache/lowe/locations"
+
+    Returns
+    -------
+    GeographyIndex
+        Index of states, MSAs, counties, and places
+    """
+    index = _hierarchy.get("default", None)
+    if index is not None:
+        return index
+
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "lowe", "locations")
+
+    with _hierarchy_lock:
+        index = _hierarchy.get("default", None)
+        if index is None:  # Nobody else loaded it while we waited for the lock
+            source = []
+            for package, fname in [
+                ("lowe.locations.datasets", "cbsas.csv"),
+                ("lowe.locations.datasets", "city_geoids.csv"),
+                ("lowe.locations.datasets", "place_counties.csv"),
+                ("lowe.locations.lookuptables", "cities.json"),
+            ]:
+                with pkg_resources.path(package, fname) as path:
+                    stat = os.stat(path)
+                source.append(f"{fname} {stat.st_size} {stat.st_mtime_ns}")
+            source = json.dumps(source)
+
+            path = os.path.join(cache_dir, "hierarchy.npz")
+            try:
+                index = GeographyIndex.load(path)
+            except (OSError, ValueError, KeyError):
+                index = None
+
+            if index is None or index.source != source:
+                index = GeographyIndex.build(source=source)
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                index.save(tmp)
+                os.replace(tmp, path)
+            _hierarchy["default"] = index
+
+    return index
+
+
+def reload_hierarchy():
+    """Empties the cached geography index so it is read from disk again on next use"""
+    with _hierarchy_lock:
+        _hierarchy.clear()
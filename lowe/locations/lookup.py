@@ -1,14 +1,46 @@
+from __future__ import annotations  # Annotations like pd.DataFrame would load pandas
+
+import hashlib
 import json
-import pandas as pd
+import os
+import threading
 
 from bidict import bidict
-from typing import Dict
+from lowe.utils.lazy import lazy_import
+from lowe.locations.searchindex import SearchIndex
+from typing import Dict, Union
 
 try:
     import importlib.resources as pkg_resources
 except ImportError:
     import importlib_resources as pkg_resources
 
+# Loaded the first time they are used, so the lookups start quickly
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Decoder tables, in the order load_decoder_tables returns them
+DECODER_TABLES = ["cities", "counties", "msas", "states"]
+
+# Geography types accepted by the lookups and the tables they are in
+CODETYPES = {
+    "city": "cities",
+    "cities": "cities",
+    "county": "counties",
+    "counties": "counties",
+    "msa": "msas",
+    "msas": "msas",
+    "state": "states",
+    "states": "states",
+}
+
+# Decoders and indexes loaded by load_decoder_tables and load_lookup_index,
+# shared by every lookup in the process
+_decoder_tables = {}
+_lookup_index = {}
+_search_index = {}
+_decoder_tables_lock = threading.Lock()
+
 # -------------------------------
 # Utility Functions
 # -------------------------------
@@ -16,13 +48,26 @@ except ImportError:
 # Functions for generating relevant datasets
 
 
-def generate_lookup_tables() -> dict:
+def generate_lookup_tables(directory: str = None) -> dict:
+    """generate_lookup_tables makes the decoder tables from datasets/*.csv and saves them to lookuptables/*.json
+
+    Parameters
+    ----------
+    directory : str, optional
+        Directory with the datasets and lookuptables folders, by default lowe/locations
+        The lookups read the tables in lowe/locations, and rebuild their indexes when those change
+    """
+    if directory is None:
+        directory = os.path.dirname(_decoder_tables_dir())
+    datasets = os.path.join(directory, "datasets")
+    lookuptables = os.path.join(directory, "lookuptables")
+
     # Load datasets
-    cbsas = pd.read_csv("datasets/cbsas.csv", skipfooter=4)
-    cities = pd.read_csv("datasets/city_geoids.csv")
+    cbsas = pd.read_csv(os.path.join(datasets, "cbsas.csv"), skipfooter=4)
+    cities = pd.read_csv(os.path.join(datasets, "city_geoids.csv"))
     # decoder_states = {k.fips: k.abbr.lower() for k in us.states.STATES_AND_TERRITORIES}
     # decoder_states can be generated with the us package, but only works on python 3.8
-    with pkg_resources.open_text("lowe.locations.lookuptables", "states.json") as f:
+    with open(os.path.join(lookuptables, "states.json"), encoding="utf-8") as f:
         decoder_states = json.load(f)
 
     # Rename columns to make sure they are standardized
@@ -85,39 +130,231 @@ def generate_lookup_tables() -> dict:
 
     # Save the dictionaries in JSON format
 
-    with open("lookuptables/cities.json", "w", encoding="utf-8") as f:
+    with open(os.path.join(lookuptables, "cities.json"), "w", encoding="utf-8") as f:
         json.dump(decoder_cities, f, ensure_ascii=False, indent=4)
 
-    with open("lookuptables/counties.json", "w", encoding="utf-8") as f:
+    with open(os.path.join(lookuptables, "counties.json"), "w", encoding="utf-8") as f:
         json.dump(decoder_counties, f, ensure_ascii=False, indent=4)
 
-    with open("lookuptables/msas.json", "w", encoding="utf-8") as f:
+    with open(os.path.join(lookuptables, "msas.json"), "w", encoding="utf-8") as f:
         json.dump(decoder_msas, f, ensure_ascii=False, indent=4)
 
-    with open("lookuptables/states.json", "w", encoding="utf-8") as f:
+    with open(os.path.join(lookuptables, "states.json"), "w", encoding="utf-8") as f:
         json.dump(decoder_states, f, ensure_ascii=False, indent=4)
 
+    # The lookup indexes are stamped with the tables, so they are rebuilt on next use
+    reload_decoder_tables()
+
     return decoder_cities, decoder_counties, decoder_msas, decoder_states
 
 
+def _read_decoder_table(table: str) -> dict:
+    with pkg_resources.open_text("lowe.locations.lookuptables", f"{table}.json") as f:
+        return json.load(f)
+
+
+def _read_decoder_tables():
+    return tuple(_read_decoder_table(table) for table in DECODER_TABLES)
+
+
+def _decoder_tables_dir() -> str:
+    from lowe.locations import lookuptables
+
+    return os.path.dirname(os.path.abspath(lookuptables.__file__))
+
+
+def _cache_dir() -> str:
+    return os.path.join(os.path.expanduser("~"), ".cache", "lowe", "locations")
+
+
+def _source_stamp(table: str) -> str:
+    """Describes the decoder table JSON file, to tell if an index built from it is out of date"""
+    stat = os.stat(os.path.join(_decoder_tables_dir(), f"{table}.json"))
+    return f"{table}.json {stat.st_size} {stat.st_mtime_ns}"
+
+
 def load_decoder_tables(convert_to_bidict: bool = True):
-    # Load the files
-    with pkg_resources.open_text("lowe.locations.lookuptables", "cities.json") as f:
-        cities = json.load(f)
-    with pkg_resources.open_text("lowe.locations.lookuptables", "counties.json") as f:
-        counties = json.load(f)
-    with pkg_resources.open_text("lowe.locations.lookuptables", "msas.json") as f:
-        msas = json.load(f)
-    with pkg_resources.open_text("lowe.locations.lookuptables", "states.json") as f:
-        states = json.load(f)
+    """load_decoder_tables returns the decoders for cities, counties, MSAs, and states
+
+    The JSON files are only read the first time the tables are requested; later calls
+    return the same objects, so don't modify them. Call reload_decoder_tables after
+    regenerating the files to pick up the changes.
+
+    Parameters
+    ----------
+    convert_to_bidict : bool, optional
+        Whether to return bidicts (which can also translate names to FIPS codes) or
+        plain dictionaries from FIPS codes to names, by default True
+
+    Returns
+    -------
+    tuple
+        (cities, counties, msas, states) decoders
+    """
+    key = "bidict" if convert_to_bidict else "dict"
+    tables = _decoder_tables.get(key, None)
+    if tables is not None:
+        return tables
+
+    with _decoder_tables_lock:
+        if "dict" not in _decoder_tables:  # Nobody else loaded them while we waited
+            _decoder_tables["dict"] = _read_decoder_tables()
+        if convert_to_bidict and "bidict" not in _decoder_tables:
+            _decoder_tables["bidict"] = tuple(
+                bidict(table) for table in _decoder_tables["dict"]
+            )
+        tables = _decoder_tables[key]
+
+    return tables
+
+
+def _build_lookup_index(decoder: Dict[str, str]) -> np.ndarray:
+    # Entries without a name (like NaN from missing states) can't be looked up anyway
+    entries = [(fips, name) for fips, name in decoder.items() if isinstance(name, str)]
+    fips = np.array([fips.encode("utf-8") for fips, _ in entries])
+    names = np.array([name.encode("utf-8") for _, name in entries])
+
+    order = np.argsort(fips, kind="stable")
+    fips, names = fips[order], names[order]
+
+    index = np.empty(
+        len(entries),
+        dtype=[("fips", fips.dtype), ("name", names.dtype), ("by_name", "<i4")],
+    )
+    index["fips"] = fips
+    index["name"] = names
+    index["by_name"] = np.argsort(names, kind="stable")
+    return index
+
+
+def _lookup_index_path(table: str, directory: str) -> str:
+    """Index files are named after the stamp of the JSON they were built from, ex. cities.1a2b3c4d5e6f.npy"""
+    stamp = hashlib.sha1(_source_stamp(table).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(directory, f"{table}.{stamp}.npy")
+
+
+def _save_lookup_index(table: str, directory: str) -> str:
+    path = _lookup_index_path(table, directory)
+    index = _build_lookup_index(_read_decoder_table(table))
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, index)
+    os.replace(tmp, path)
+
+    # Remove the indexes of older versions of the table
+    for fname in os.listdir(directory):
+        old = os.path.join(directory, fname)
+        if fname.startswith(f"{table}.") and fname.endswith(".npy") and old != path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return path
+
+
+def generate_lookup_index(directory: str = None):
+    """generate_lookup_index saves the decoder tables as binary indexes that lookups can search without loading them
+
+    Each table is saved as [table].[stamp].npy, an array of records sorted by FIPS code with the fields
+    "fips" and "name" (UTF-8 bytes) and "by_name" (the positions of the records sorted by name).
+    The stamp is made from the size and modification time of the JSON table, so an index is never
+    used with a table it wasn't built from. The files are memory-mapped by load_lookup_index, so
+    both directions of a lookup are binary searches that only read the pages they touch.
+
+    Lookups build the indexes they need on first use, so this only has to be run to build
+    them ahead of time, ex. before starting worker processes.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Directory to save the indexes to, by default "~/.cache/lowe/locations"
+    """
+    if directory is None:
+        directory = _cache_dir()
+    for table in DECODER_TABLES:
+        _save_lookup_index(table, directory)
+
+
+def load_lookup_index(codetype: str, cache_dir: str = None):
+    """load_lookup_index returns the binary index of a table, building it if needed
+
+    The index is built from the decoder table the first time it is requested and whenever the
+    table changes (see generate_lookup_index). It is memory-mapped and shared afterwards.
+
+    Parameters
+    ----------
+    codetype : str
+        Table to load. Possible values are "state", "msa", "county", "city"
+    cache_dir : str, optional
+        Directory to keep the indexes in, by default "~/.cache/lowe/locations"
+
+    Returns
+    -------
+    np.ndarray
+        Read-only array of records with "fips", "name", and "by_name" fields,
+        or None if the index can't be saved (the lookups then use the JSON tables)
+    """
+    table = CODETYPES[codetype.lower()]
+    if table in _lookup_index:
+        return _lookup_index[table]
+
+    if cache_dir is None:
+        cache_dir = _cache_dir()
+
+    with _decoder_tables_lock:
+        if table not in _lookup_index:  # Nobody else loaded it while we waited
+            try:
+                index = np.load(_lookup_index_path(table, cache_dir), mmap_mode="r")
+            except (OSError, ValueError):
+                index = None
+            if index is None:
+                try:
+                    path = _save_lookup_index(table, cache_dir)
+                    index = np.load(path, mmap_mode="r")
+                except OSError as e:
+                    print(f"Warning: could not save the {table} lookup index: {e}")
+            _lookup_index[table] = index
+        index = _lookup_index[table]
+
+    return index
+
+
+def reload_decoder_tables():
+    """Empties the cached decoders and indexes so they are read from disk again on next use"""
+    with _decoder_tables_lock:
+        _decoder_tables.clear()
+        _lookup_index.clear()
+        _search_index.clear()
+
+
+def _lookup(codetype: str, key: str, by: str = "fips") -> str:
+    """_lookup translates one FIPS code to its name (by="fips") or one name to its FIPS code (by="name")
+
+    Uses the binary index of the table if it could be saved, and the decoder tables otherwise.
+    Raises a KeyError if the code or name isn't in the table.
+    """
+    table = CODETYPES[codetype.lower()]
+    index = load_lookup_index(table)
+
+    if index is None:
+        decoder = load_decoder_tables()[DECODER_TABLES.index(table)]
+        return decoder[key] if by == "fips" else decoder.inverse[key]
+
+    other = "name" if by == "fips" else "fips"
+    keys = index[by]
+    sorter = index["by_name"] if by == "name" else None
+    value = key.encode("utf-8")
 
-    if convert_to_bidict:
-        cities = bidict(cities)
-        counties = bidict(counties)
-        msas = bidict(msas)
-        states = bidict(states)
+    # Longer keys would be cut to the width of the field and could match a shorter one
+    if len(value) <= keys.dtype.itemsize:
+        pos = int(np.searchsorted(keys, value, sorter=sorter))
+        if pos < len(keys):
+            row = pos if sorter is None else sorter[pos]
+            if keys[row] == value:
+                return index[other][row].decode("utf-8")
 
-    return cities, counties, msas, states
+    raise KeyError(key)
 
 
 # -------------------------------
@@ -165,24 +402,22 @@ def fips2name(loc: Dict[str, str]) -> Dict[str, str]:
                     "ERROR: Make sure to either pass in county FIPS as [state]_[county] or include state as well"
                 )
 
-    cities, counties, msas, states = load_decoder_tables()
-
     res = dict({})
 
     if loc_city is not None:
         if len(loc_city) < 7:
             loc_city = loc_state + loc_city
-        res["city"] = cities[loc_city]
+        res["city"] = _lookup("city", loc_city)
     if loc_county is not None:
         if "_" not in loc_county:
             print(
                 "Warning: county FIPS codes should be in the format [statecode]_[countycode]"
             )
-        res["county"] = counties[loc_county]
+        res["county"] = _lookup("county", loc_county)
     if loc_msa is not None:
-        res["msa"] = msas[loc_msa]
+        res["msa"] = _lookup("msa", loc_msa)
     if loc_state is not None:
-        res["state"] = states[loc_state]
+        res["state"] = _lookup("state", loc_state)
 
     # If only the city is passed in and not the state, infer it
 
@@ -212,18 +447,11 @@ def _name2fips_helper(name: str, codetype: str = None) -> Dict[str, str]:
     """
     name = name.lower()
     codetype = codetype.lower()
-    cities, counties, msas, states = load_decoder_tables()
-
-    if codetype == "state" or codetype == "states":
-        return states.inverse[name]
-    elif codetype == "msa" or codetype == "msas":
-        return msas.inverse[name]
-    elif codetype == "county" or codetype == "counties":
-        if "_" not in name:
+
+    if codetype in CODETYPES:
+        if CODETYPES[codetype] == "counties" and "_" not in name:
             print("Warning: Pass in county FIPS codes as [state]_[county]")
-        return counties.inverse[name]
-    elif codetype == "city" or codetype == "cities":
-        return cities.inverse[name]
+        return _lookup(codetype, name, by="name")
 
     return None
 
@@ -251,6 +479,179 @@ def name2fips(loc: Dict[str, str]) -> Dict[str, str]:
     return res
 
 
+def _lookup_many(codetype: str, keys: np.ndarray, by: str = "fips") -> np.ndarray:
+    """_lookup_many is _lookup for an array of unique codes or names at once
+
+    Returns an object array with the translations, None where a key isn't in the table
+    """
+    table = CODETYPES[codetype.lower()]
+    index = load_lookup_index(table)
+    res = np.full(len(keys), None, dtype=object)
+    valid = np.array([isinstance(key, str) for key in keys], dtype=bool)
+    if not valid.any():
+        return res
+
+    if index is None:
+        decoder = load_decoder_tables()[DECODER_TABLES.index(table)]
+        decoder = decoder if by == "fips" else decoder.inverse
+        res[valid] = [decoder.get(key, None) for key in keys[valid]]
+        return res
+
+    other = "name" if by == "fips" else "fips"
+    column = index[by]
+    sorter = index["by_name"] if by == "name" else None
+    values = np.char.encode(keys[valid].astype(str), "utf-8")
+
+    # Longer keys would be cut to the width of the field and could match a shorter one
+    fits = np.char.str_len(values) <= column.dtype.itemsize
+    values = values.astype(column.dtype)
+    pos = np.searchsorted(column, values, sorter=sorter).clip(max=len(column) - 1)
+    rows = pos if sorter is None else sorter[pos]
+    found = fits & (column[rows] == values)
+
+    translated = np.full(len(values), None, dtype=object)
+    translated[found] = np.char.decode(index[other][rows[found]], "utf-8")
+    res[valid] = translated
+    return res
+
+
+def _translate(
+    data: pd.Series, codetype: Union[str, pd.Series], by: str, errors: str
+) -> pd.Series:
+    """Translates a Series of codes (by="fips") or names (by="name") of one or more geography types"""
+    if isinstance(codetype, str):
+        codetype = pd.Series(codetype, index=data.index)
+    else:
+        codetype = pd.Series(np.asarray(codetype), index=data.index)
+    tables = codetype.str.lower().map(CODETYPES).to_numpy(dtype=object)
+
+    if by == "name":
+        data = data.str.lower().str.strip()
+
+    values = data.to_numpy(dtype=object)
+    translated = np.full(len(values), None, dtype=object)
+    for table in pd.unique(tables[pd.notna(tables)]):
+        rows = np.flatnonzero(tables == table)
+        # Each distinct value is only looked up once
+        codes, uniques = pd.factorize(values[rows])
+        res = _lookup_many(table, np.asarray(uniques, dtype=object), by=by)
+        translated[rows] = np.where(codes >= 0, res[codes], None)
+
+    res = pd.Series(translated, index=data.index, name=data.name)
+    missing = res.isna() & data.notna()
+    if missing.any():
+        if errors == "raise":
+            raise KeyError(
+                f"Error: could not translate {missing.sum()} values, ex. {data[missing].iloc[0]!r}"
+            )
+        print(
+            f"Warning: could not translate {missing.sum()} values, ex. {data[missing].iloc[0]!r}"
+        )
+    return res.fillna(np.nan)
+
+
+def _translate_frame(data: pd.DataFrame, by: str, errors: str) -> pd.DataFrame:
+    res = data.copy()
+    columns = [col for col in data.columns if str(col).lower() in CODETYPES]
+    for col in columns:
+        values = data[col]
+        if by == "fips":
+            values = _full_fips(data, col)
+        res[col] = _translate(values, str(col), by=by, errors=errors)
+    return res
+
+
+def _full_fips(data: pd.DataFrame, col: str) -> pd.Series:
+    """Adds the state code to city and county FIPS codes passed without it, like fips2name"""
+    values = data[col]
+    if "state" not in data.columns or col.lower() not in ["city", "county"]:
+        return values
+
+    state = data["state"].astype(object)
+    if col.lower() == "city":
+        short = values.str.len() < 7
+        return values.where(~short, state + values)
+    short = ~values.str.contains("_", regex=False).fillna(True)
+    return values.where(~short, state + "_" + values)
+
+
+def fips2name_bulk(
+    data: Union[pd.Series, pd.DataFrame],
+    codetype: Union[str, pd.Series] = None,
+    errors: str = "coerce",
+) -> Union[pd.Series, pd.DataFrame]:
+    """fips2name_bulk converts a Series or DataFrame of FIPS codes to names in one pass
+
+    Each distinct code is translated once, with vectorized searches of the lookup tables,
+    so tens of thousands of rows take about as long as a few hundred distinct locations.
+
+    Parameters
+    ----------
+    data : Union[pd.Series, pd.DataFrame]
+        FIPS codes to translate, in the same formats as fips2name
+        A Series needs codetype. In a DataFrame, every column named "state", "msa", "county",
+        or "city" is translated; short city and county codes are completed with the "state" column
+    codetype : Union[str, pd.Series], optional
+        Geography type of the codes in a Series, ex. "city", by default None
+        Pass a Series of types (aligned with data) to translate codes of mixed types
+    errors : str, optional
+        What to do with codes that aren't in the tables, by default "coerce"
+        "coerce" makes them NaN and prints a warning, "raise" raises a KeyError
+
+    Returns
+    -------
+    Union[pd.Series, pd.DataFrame]
+        Same shape as data, with names instead of FIPS codes
+    """
+    if isinstance(data, pd.DataFrame):
+        return _translate_frame(data, by="fips", errors=errors)
+    if codetype is None:
+        raise ValueError("Error: pass the codetype of the codes in the Series.")
+    return _translate(data, codetype, by="fips", errors=errors)
+
+
+def name2fips_bulk(
+    data: Union[pd.Series, pd.DataFrame],
+    codetype: Union[str, pd.Series] = None,
+    errors: str = "coerce",
+) -> Union[pd.Series, pd.DataFrame]:
+    """name2fips_bulk converts a Series or DataFrame of names to FIPS codes in one pass
+
+    Each distinct name is translated once, with vectorized searches of the lookup tables,
+    so tens of thousands of rows (ex. the city column of an EDD or taxable sales file)
+    take about as long as a few hundred distinct locations.
+
+        df = pd.DataFrame({"city": ["palm springs, ca", "indio, ca"], "state": ["ca", "ca"]})
+        name2fips_bulk(df) -->
+               city state
+            0  0655254    06
+            1  0636448    06
+
+    Parameters
+    ----------
+    data : Union[pd.Series, pd.DataFrame]
+        Names to translate, in the same format as name2fips (case doesn't matter)
+        A Series needs codetype. In a DataFrame, every column named "state", "msa", "county",
+        or "city" is translated
+    codetype : Union[str, pd.Series], optional
+        Geography type of the names in a Series, ex. "city", by default None
+        Pass a Series of types (aligned with data) to translate names of mixed types
+    errors : str, optional
+        What to do with names that aren't in the tables, by default "coerce"
+        "coerce" makes them NaN and prints a warning, "raise" raises a KeyError
+
+    Returns
+    -------
+    Union[pd.Series, pd.DataFrame]
+        Same shape as data, with FIPS codes instead of names
+    """
+    if isinstance(data, pd.DataFrame):
+        return _translate_frame(data, by="name", errors=errors)
+    if codetype is None:
+        raise ValueError("Error: pass the codetype of the names in the Series.")
+    return _translate(data, codetype, by="name", errors=errors)
+
+
 # -------------------------------
 # Search Functions
 # -------------------------------
@@ -296,8 +697,60 @@ def generate_df_json(codetype: str):
     return None
 
 
-def search(query: str, codetype: str, search_on: str = None) -> pd.DataFrame:
-    """search searches the relevant dataset specified by codetype for all entries matching the fips code or name provided
+def load_search_index(codetype: str, cache_dir: str = None) -> SearchIndex:
+    """load_search_index returns the search index of a table, building it if needed
+
+    Indexes are saved to cache_dir the first time they are built, and rebuilt when the
+    decoder table they were built from changes. Within a process, the loaded index is shared.
+
+    Parameters
+    ----------
+    codetype : str
+        Table to load. Possible values are "state", "msa", "county", "city"
+    cache_dir : str, optional
+        Directory to keep the indexes in, by default "~/.cache/lowe/locations"
+
+    Returns
+    -------
+    SearchIndex
+        Index of the names and FIPS codes in the table
+    """
+    table = CODETYPES[codetype.lower()]
+    index = _search_index.get(table, None)
+    if index is not None:
+        return index
+
+    if cache_dir is None:
+        cache_dir = _cache_dir()
+
+    with _decoder_tables_lock:
+        index = _search_index.get(table, None)
+        if index is None:  # Nobody else loaded it while we waited for the lock
+            source = _source_stamp(table)
+            path = os.path.join(cache_dir, f"{table}.search.npz")
+            try:
+                index = SearchIndex.load(path)
+            except (OSError, ValueError, KeyError):
+                index = None
+
+            if index is None or index.source != source:
+                index = SearchIndex.build(_read_decoder_table(table), source=source)
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                index.save(tmp)
+                os.replace(tmp, path)
+            _search_index[table] = index
+
+    return index
+
+
+def search(
+    query: str, codetype: str, search_on: str = None, limit: int = 25
+) -> pd.DataFrame:
+    """search searches the relevant dataset specified by codetype for the entries best matching the fips code or name provided
+
+    Names are matched with a trigram index, so partial and slightly misspelled names work:
+    search("palm sprngs", "city") finds "palm springs, ca". FIPS codes are matched by prefix.
 
     Parameters
     ----------
@@ -306,20 +759,24 @@ def search(query: str, codetype: str, search_on: str = None) -> pd.DataFrame:
     codetype : str
         Dataset to look into. Possible values are "state", "msa", "county", "city"
     search_on : str, optional
-        Search by "fips" or by "name", by default "name"
+        Search by "fips" or by "name", by default "fips" if the query looks like a FIPS code and "name" otherwise
         If "name", pass in the name of the geography you want to find the FIPS code for
+    limit : int, optional
+        Maximum number of results, by default 25
 
     Returns
     -------
-    None. Prints the first 25 search results in dataframe format
+    pd.DataFrame
+        Matches with "name", "fips", and "score" columns, best match first
     """
     if search_on is None:
-        search_on = "fips" if query.isdigit() else "name"
-    df = generate_df_json(codetype=codetype)
-    df = df.astype(str)  # Convert all cols to string
-    df = df[df[search_on].str.contains(query)]
-    pd.options.display.max_rows = len(df) if len(df) < 25 else 25
-    return df
+        search_on = "fips" if query.replace("_", "").isdigit() else "name"
+    index = load_search_index(codetype)
+    if search_on == "fips":
+        matches = index.search_fips(query, limit=limit)
+    else:
+        matches = index.search_name(query, limit=limit)
+    return pd.DataFrame(matches, columns=["name", "fips", "score"])
 
 
 """
@@ -0,0 +1,192 @@
+from __future__ import annotations  # Annotations like np.ndarray would load numpy
+
+from lowe.utils.lazy import lazy_import
+from typing import Dict, List, Tuple
+
+np = lazy_import("numpy")
+
+
+def _trigrams(text: str) -> set:
+    """Returns the 3-character pieces of text, padded with spaces so starts and ends count too"""
+    text = f" {text} "
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class SearchIndex(object):
+    def __init__(
+        self,
+        fips: np.ndarray,
+        names: np.ndarray,
+        grams: np.ndarray,
+        offsets: np.ndarray,
+        postings: np.ndarray,
+        source: str = "",
+    ):
+        """the SearchIndex class finds locations of one table by name or FIPS code
+
+        Names are split into trigrams ("palm" -> " pa", "pal", "alm", "lm "), and the index
+        keeps, for each trigram, the locations whose names contain it. A query is scored against
+        every location at once by counting the trigrams they share, so misspelled names still
+        match, then ranked: exact matches, names starting with the query, names containing it,
+        and finally by trigram similarity. Use SearchIndex.build to make one from a decoder.
+
+        Parameters
+        ----------
+        fips : np.ndarray
+            FIPS codes of the locations, sorted
+        names : np.ndarray
+            Lowercase names of the locations, in the same order
+        grams : np.ndarray
+            Sorted trigrams found in the names
+        offsets : np.ndarray
+            Locations containing grams[i] are postings[offsets[i]:offsets[i + 1]]
+        postings : np.ndarray
+            Positions of the locations containing each trigram
+        source : str, optional
+            Description of the data the index was built from, used to tell if it is out of date
+        """
+        self.fips = fips
+        self.names = names
+        self.grams = grams
+        self.offsets = offsets
+        self.postings = postings
+        self.source = source
+
+        # Number of distinct trigrams in each name, for the similarity scores
+        self.sizes = np.bincount(postings, minlength=len(names))
+        # Positions of the names in alphabetical order, for prefix searches
+        self.by_name = np.argsort(names, kind="stable")
+
+    @classmethod
+    def build(cls, decoder: Dict[str, str], source: str = "") -> SearchIndex:
+        """build makes a search index from a decoder of FIPS codes to names, ex. {"06": "ca", ...}
+
+        Entries without a name (like NaN from missing states) are left out.
+        """
+        entries = sorted(
+            (fips, _normalize(name))
+            for fips, name in decoder.items()
+            if isinstance(name, str)
+        )
+        postings = {}
+        for i, (_, name) in enumerate(entries):
+            for gram in _trigrams(name):
+                postings.setdefault(gram, []).append(i)
+
+        grams = sorted(postings)
+        sizes = [len(postings[gram]) for gram in grams]
+        return cls(
+            fips=np.array([fips for fips, _ in entries], dtype=str),
+            names=np.array([name for _, name in entries], dtype=str),
+            grams=np.array(grams, dtype=str),
+            offsets=np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64),
+            postings=np.array(
+                [i for gram in grams for i in postings[gram]], dtype=np.int32
+            ),
+            source=source,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> SearchIndex:
+        """Loads an index saved with SearchIndex.save"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                fips=data["fips"],
+                names=data["names"],
+                grams=data["grams"],
+                offsets=data["offsets"],
+                postings=data["postings"],
+                source=str(data["source"]),
+            )
+
+    def save(self, path: str):
+        """Saves the index to path (a .npz file)"""
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                fips=self.fips,
+                names=self.names,
+                grams=self.grams,
+                offsets=self.offsets,
+                postings=self.postings,
+                source=np.array(self.source),
+            )
+
+    def _prefix_range(self, values: np.ndarray, prefix: str, sorter=None) -> range:
+        lo = np.searchsorted(values, prefix, sorter=sorter)
+        hi = np.searchsorted(values, prefix + "\U0010ffff", sorter=sorter)
+        return range(int(lo), int(hi))
+
+    def search_fips(self, query: str, limit: int = 25) -> List[Tuple[str, str, float]]:
+        """search_fips returns the locations whose FIPS codes start with query, or contain it if none do
+
+        Returns
+        -------
+        List[Tuple[str, str, float]]
+            Up to limit (name, fips, score) matches, in FIPS order. Scores are always 1
+        """
+        rows = self._prefix_range(self.fips, query)
+        if len(rows) == 0:
+            rows = np.flatnonzero(np.char.find(self.fips, query) >= 0)
+        return [(str(self.names[i]), str(self.fips[i]), 1.0) for i in rows[:limit]]
+
+    def search_name(
+        self, query: str, limit: int = 25, min_score: float = 0.3
+    ) -> List[Tuple[str, str, float]]:
+        """search_name returns the locations whose names best match query
+
+        Parameters
+        ----------
+        query : str
+            Name to look for, ex. "palm springs" or "palm sprngs, ca"
+        limit : int, optional
+            Maximum number of matches to return, by default 25
+        min_score : float, optional
+            Lowest trigram similarity (0 to 1) of a match that doesn't contain the query, by default 0.3
+            Lower it to tolerate more typos
+
+        Returns
+        -------
+        List[Tuple[str, str, float]]
+            (name, fips, score) matches, best first. The score is the trigram similarity
+            of the name and the query, 1 for an exact match
+        """
+        query = _normalize(query)
+        if not query:
+            return []
+
+        # Count the trigrams of the query in every name at once
+        counts = np.zeros(len(self.names), dtype=np.int32)
+        qgrams = _trigrams(query)
+        pos = np.searchsorted(self.grams, sorted(qgrams))
+        for gram, i in zip(sorted(qgrams), pos):
+            if i < len(self.grams) and self.grams[i] == gram:
+                counts[self.postings[self.offsets[i] : self.offsets[i + 1]]] += 1
+        scores = 2 * counts / (len(qgrams) + self.sizes)
+
+        # The most similar names, plus every name starting with the query
+        n = min(len(scores), max(4 * limit, 100))
+        candidates = set(np.argpartition(-scores, n - 1)[:n].tolist())
+        prefix = self._prefix_range(self.names, query, sorter=self.by_name)
+        candidates.update(self.by_name[prefix.start : prefix.stop][:n].tolist())
+
+        ranked = []
+        for i in candidates:
+            name = str(self.names[i])
+            contains = query in name
+            if not contains and scores[i] < min_score:
+                continue
+            rank = (name == query, name.startswith(query), contains, scores[i])
+            ranked.append((rank, name, str(self.fips[i])))
+
+        # Best rank first, ties broken by name and then FIPS code so the order is stable
+        ranked.sort(key=lambda match: (match[1], match[2]))
+        ranked.sort(key=lambda match: match[0], reverse=True)
+        return [
+            (name, fips, round(float(rank[-1]), 3))
+            for rank, name, fips in ranked[:limit]
+        ]
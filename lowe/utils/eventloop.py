@@ -0,0 +1,50 @@
+import asyncio
+import atexit
+import sys
+import threading
+
+from typing import Coroutine
+
+# Process-wide background loop shared by the synchronous clients
+_loop = None
+_loop_lock = threading.Lock()
+
+
+class BackgroundLoop(object):
+    def __init__(self):
+        """the BackgroundLoop class runs an asyncio event loop in a daemon thread
+
+        Synchronous code (scripts, notebooks that already have a running loop, the CLI)
+        can hand coroutines to it with run() and block on the result. Because the loop
+        lives as long as the process, aiohttp sessions created on it stay open and keep
+        their connections warm between calls.
+        """
+        if sys.platform == "win32":
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name="lowe-event-loop", daemon=True
+        )
+        self._thread.start()
+
+    def run(self, coro: Coroutine):
+        """Runs a coroutine on the background loop and returns its result"""
+        if not self.loop.is_running():
+            raise RuntimeError("Error: the background event loop has been stopped.")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def stop(self):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+
+
+def get_loop() -> BackgroundLoop:
+    """Returns the process-wide BackgroundLoop, starting it on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = BackgroundLoop()
+            atexit.register(_loop.stop)
+    return _loop
@@ -0,0 +1,60 @@
+import importlib
+import importlib.util
+import sys
+import threading
+import types
+
+
+class _LazyModule(types.ModuleType):
+    def __init__(self, name: str):
+        """the _LazyModule class stands in for a module until one of its attributes is used
+
+        The module is then imported normally, under a lock so threads using it at the same
+        time (ex. store reads in executor threads) all wait for one import. sys.modules only
+        ever holds the real module.
+        """
+        super().__init__(name)
+        self._lazy_lock = threading.Lock()
+        self._lazy_module = None
+
+    def _load(self) -> types.ModuleType:
+        module = self._lazy_module
+        if module is None:
+            with self._lazy_lock:
+                if self._lazy_module is None:  # Nobody else imported it while we waited
+                    self._lazy_module = importlib.import_module(self.__name__)
+                module = self._lazy_module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str):
+    """lazy_import returns a module that is only loaded the first time one of its attributes is used
+
+    Heavy dependencies (pandas, aiohttp, ...) imported this way don't slow down importing
+    the modules that use them, ex. for the CLI or when only part of a client is needed.
+
+        pd = lazy_import("pandas")  # Nothing is loaded yet
+        pd.DataFrame()  # pandas is imported here
+
+    Parameters
+    ----------
+    name : str
+        Full name of the module, ex. "pandas" or "pyarrow.parquet"
+
+    Returns
+    -------
+    module
+        The module if it is already loaded, else a stand-in that loads it on first use
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    if importlib.util.find_spec(name) is None:
+        raise ImportError(f"Error: could not find the module {name}.")
+    return _LazyModule(name)
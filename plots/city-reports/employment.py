@@ -7,6 +7,8 @@ import plotly.graph_objects as go
 import plotly.express as px
 
 from lowe.bls.BLSClient import BLSClient
+from lowe.bls.catalog import laus_series_id
+from lowe.locations.lookup import name2fips
 
 try:
     import importlib.resources as pkg_resources
@@ -310,7 +312,8 @@ def employment_composition_pandemic_now(
 # Not available for Indian Wells and Rancho Mirage (< 25,000 population)
 
 
-def unemployment_rates(
+async def unemployment_rates(
+    client: BLSClient,
     city: str,
     year: str = None,
     save_path: str = None,
@@ -379,39 +382,31 @@ def unemployment_rates(
 
     year = datetime.datetime.now().year if year is None else year
 
-    # Get the codes for BLS
+    # Get the codes for BLS. The US rate comes from the CPS, the rest are LAUS series
+    # built from FIPS codes (the Inland Empire is MSA 40140)
     with pkg_resources.open_text("lowe.bls", "bls_series.json") as f:
         bls_series = json.load(f)
 
-    ur_codes = bls_series["Unemployment Rate"]
-
-    codes = [ur_codes["US"], ur_codes["CA"], ur_codes["IE"], ur_codes[city.title()]]
+    codes = [
+        bls_series["Unemployment Rate"]["US"],
+        laus_series_id({"state": "06"}),
+        laus_series_id({"state": "06", "msa": "40140"}),
+        laus_series_id(name2fips({"state": "ca", "city": f"{city.lower()}, ca"})),
+    ]
     names = ["ur_us", "ur_ca", "ur_ie", f"ur_{city.title()}"]
 
-    # Initialize a BLS client and get the data
-    client = BLSClient()
-
-    data_raw = client.get_bls(
+    # Get the data, one column per series
+    df = await client.get_bls(
         seriesid=codes,
         startyear="2005",
         endyear=year,
         valuename=names,
+        wide=True,
     )
 
-    # Clean the data and join the datasets together
-    df = data_raw[0].drop(columns=["year", "latest"])
-    df["time"] = df["time"].apply(lambda x: datetime.datetime.strftime(x, "%b %Y"))
-
-    for new_df in data_raw[1:]:
-        new_df.drop(columns=["year", "latest"], inplace=True)
-        new_df["time"] = new_df["time"].apply(
-            lambda x: datetime.datetime.strftime(x, "%b %Y")
-        )
-        df = df.merge(new_df, on="time")
-
-    for col in df.columns:
-        if "ur" in col:
-            df[col] = df[col].astype(float)
+    # Only keep months that every series has data for
+    df = df.dropna(how="any")
+    df["time"] = df.index.to_timestamp()
 
     fig = plots(df)
 
@@ -35,7 +35,6 @@ from employment import (
 from taxable_sales import (
     real_nominal_sales_pc_time_series,
     taxable_sales_per_capita_quarters_cv,
-    timer,
 )
 
 from education_human_capital import human_capital_index_cv, educational_attainment_cv
@@ -43,6 +42,7 @@ from education_human_capital import human_capital_index_cv, educational_attainme
 from health_insurance import health_insurance
 
 from lowe.acs.ACSClient import ACSClient
+from lowe.bls.BLSClient import BLSClient
 
 
 # ------------------------------
@@ -198,9 +198,10 @@ async def income_plots(target_city: str, acs_year: int, client: ACSClient):
     )
 
 
-@timer
-def employment_plots(
+@timer_async
+async def employment_plots(
     target_city: str,
+    client: BLSClient,
     data_path: str = "data/CV_EMPL.csv",
     bls_year: int = 2022,
     edd_year: int = 2021,
@@ -217,7 +218,8 @@ def employment_plots(
         "Indian Wells",
         "Rancho Mirage",
     ]:  # These cities don't have unemployment rates in BLS due to population < 25,000
-        unemployment_rates(
+        await unemployment_rates(
+            client=client,
             city=target_city,
             year=str(bls_year),
             save_path=f"outputs/{target_city}/Unemployment Rate, {target_city}, Inland Empire, California, United States, 2000-{bls_year}",
@@ -239,10 +241,12 @@ def employment_plots(
     )
 
 
-@timer
-def taxable_sales_plots(target_city: str, data_path: str = "data/taxable_sales.csv"):
+@timer_async
+async def taxable_sales_plots(
+    target_city: str, data_path: str = "data/taxable_sales.csv"
+):
     # Figure 21
-    real_nominal_sales_pc_time_series(
+    await real_nominal_sales_pc_time_series(
         city=target_city,
         data_path=data_path,
         save_path=f"outputs/{target_city}/Real and Nominal Retail Sales per Capita, {target_city}",
@@ -327,39 +331,43 @@ async def main(
     bls_year = datetime.datetime.now().year if bls_year is None else bls_year
     acs_client = ACSClient()
     await acs_client.initialize()
+    bls_client = BLSClient()
+    await bls_client.initialize()
 
     try:
         for city in cities:
             print(f"Generating plots for {city.title()}")
             print("---------------------" + "-" * len(city) + "\n")
-            await demographics_plots(
-                target_city=city,
-                dof_year=dof_year,
-                acs_year=acs_year,
-                client=acs_client,
-            )
-
-            await income_plots(target_city=city, acs_year=acs_year, client=acs_client)
 
-            employment_plots(
-                target_city=city,
-                data_path="data/CV_EMPL.csv",
-                bls_year=bls_year,
-                edd_year=edd_year,
+            # The ACS and BLS requests of these overlap instead of waiting on each other
+            await asyncio.gather(
+                demographics_plots(
+                    target_city=city,
+                    dof_year=dof_year,
+                    acs_year=acs_year,
+                    client=acs_client,
+                ),
+                income_plots(target_city=city, acs_year=acs_year, client=acs_client),
+                employment_plots(
+                    target_city=city,
+                    client=bls_client,
+                    data_path="data/CV_EMPL.csv",
+                    bls_year=bls_year,
+                    edd_year=edd_year,
+                ),
+                education_human_capital_plots(
+                    client=acs_client, target_city=city, acs_year=acs_year
+                ),
+                health_insurance_plots(
+                    client=acs_client, target_city=city, acs_year=acs_year
+                ),
             )
 
-            taxable_sales_plots(target_city=city)
-
-            await education_human_capital_plots(
-                client=acs_client, target_city=city, acs_year=acs_year
-            )
-
-            await health_insurance_plots(
-                client=acs_client, target_city=city, acs_year=acs_year
-            )
+            await taxable_sales_plots(target_city=city)
             print("\n")
     finally:
         await acs_client.close()
+        await bls_client.close()
 
 
 if __name__ == "__main__":
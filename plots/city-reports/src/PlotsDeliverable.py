@@ -1,4 +1,5 @@
-from lowe.locations.lookup import generate_df_json
+import asyncio
+from lowe.locations.lookup import name2fips
 from lowe.acs.ACSClient import ACSClient
 import pandas as pd
 import plotly.graph_objects as go
@@ -6,6 +7,7 @@ import plotly.express as px
 
 
 async def humanCapitalIndexCV(
+    client: ACSClient,
     cities: list = [
         "cathedral city, ca",
         "coachella, ca",
@@ -24,6 +26,8 @@ async def humanCapitalIndexCV(
     """
     Parameters
     ----------
+    client: ACSClient
+    Initialized client to pull the data with, shared between the plots
     cities: list of all the names of the cities in coachella valley
     target_city: the city you want to highlight in the bar graph **DONT INCLUDE THE STATE**
         i.e. 'coachella' or 'palm desert' etc
@@ -37,18 +41,11 @@ async def humanCapitalIndexCV(
     all_loc = []
 
     for city in cities:
-        df = generate_df_json(codetype="city")
-        df = df.astype(str)  # Convert all cols to string
-        # df[df['A'].str.contains("hello")]
-        df = df[df["name"].str.contains(city)]
-        fips = df.iloc[0]["fips"]
+        fips = name2fips({"city": city})["city"]
 
         loc = {"state": fips[0:2], "city": fips[2:]}
         all_loc.append(loc)
 
-    client = ACSClient()
-    await client.initialize()
-
     resp = await client.get_acs(
         vars=["S1501"],
         start_year="2019",
@@ -147,6 +144,7 @@ async def humanCapitalIndexCV(
 
 
 async def educationalAttainmentCV(
+    client: ACSClient,
     cities: list = [
         "cathedral city, ca",
         "coachella, ca",
@@ -164,6 +162,8 @@ async def educationalAttainmentCV(
     """
     Parameters
     ----------
+    client: ACSClient
+    Initialized client to pull the data with, shared between the plots
     cities: cities in coachella valley as a list
     save: bool
     True or False, whether or not you want to save
@@ -173,18 +173,11 @@ async def educationalAttainmentCV(
     all_loc = []
 
     for city in cities:
-        df = generate_df_json(codetype="city")
-        df = df.astype(str)  # Convert all cols to string
-        # df[df['A'].str.contains("hello")]
-        df = df[df["name"].str.contains(city)]
-        fips = df.iloc[0]["fips"]
+        fips = name2fips({"city": city})["city"]
 
         loc = {"state": fips[0:2], "city": fips[2:]}
         all_loc.append(loc)
 
-    client = ACSClient()
-    await client.initialize()
-
     resp = await client.get_acs(
         vars=["S1501"],
         start_year="2019",
@@ -276,6 +269,7 @@ async def educationalAttainmentCV(
 
 
 async def healthInsuranceCity(
+    client: ACSClient,
     cities: list = [
         "cathedral city, ca",
         "coachella, ca",
@@ -293,6 +287,8 @@ async def healthInsuranceCity(
     """
     Parameters
     ----------
+    client: ACSClient
+    Initialized client to pull the data with, shared between the plots
     city: name of the city as a list eg. ['cathedral city, ca'] or ['coachella, ca'] etc.
     save: bool
     True or False, whether or not you want to save
@@ -303,19 +299,12 @@ async def healthInsuranceCity(
     all_loc = []
 
     for city in cities:
-        df = generate_df_json(codetype="city")
-        df = df.astype(str)  # Convert all cols to string
-        # df[df['A'].str.contains("hello")]
-        df = df[df["name"].str.contains(city)]
-        fips = df.iloc[0]["fips"]
+        fips = name2fips({"city": city})["city"]
 
         loc = {"state": fips[0:2], "city": fips[2:]}
 
     all_loc.append(loc)
 
-    client = ACSClient()
-    await client.initialize()
-
     # pull data for city passed in
     resp = await client.get_acs(
         vars=["S2701"],
@@ -443,3 +432,17 @@ async def healthInsuranceCity(
     if save:
         fig.write_image(save_path)
     return fig
+
+
+async def main():
+    """main makes every plot in this file with one client, so they share its connections"""
+    async with ACSClient() as client:
+        await asyncio.gather(
+            humanCapitalIndexCV(client),
+            educationalAttainmentCV(client),
+            healthInsuranceCity(client),
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,6 +1,6 @@
 # Code written by Abhi Uppal
 
-import os
+import importlib.util
 import pandas as pd
 import plotly.graph_objects as go
 import requests
@@ -8,8 +8,8 @@ import time
 
 from datetime import datetime
 from demographics import _load_dof_data  # Get the helper from the demographics file
-from dotenv import load_dotenv
 from functools import wraps, lru_cache
+from lowe.FRED.FREDClient import FREDClient
 
 # Primary and secondary colors
 pri_color = "#961a30"
@@ -70,6 +70,19 @@ def _get_data(save_path: str = None):
     return res
 
 
+async def _get_cpi(store_dir: str = "data/fred"):
+    """Gets monthly CPI from FRED, only fetching observations that aren't in store_dir yet
+    Returns a pandas Series indexed by date"""
+    # The local store needs pyarrow, without it fetch the whole series every time
+    if importlib.util.find_spec("pyarrow") is None:
+        async with FREDClient() as client:
+            results, _ = await client.get_fred_bulk(vars=["CPIAUCSL"], frequency="m")
+            return results["CPIAUCSL"]
+
+    async with FREDClient(store_dir=store_dir) as client:
+        return (await client.sync_fred(vars=["CPIAUCSL"], frequency="m"))["CPIAUCSL"]
+
+
 def _load_data(data_path: str = None, try_save: bool = False):
     try:
         df = pd.read_csv(data_path)
@@ -89,7 +102,7 @@ def _load_data(data_path: str = None, try_save: bool = False):
 # Figure 21: Real and Nominal Taxable Retail Sales Per Capita in City, 2010-Present -- APPROVED
 
 
-def real_nominal_sales_pc_time_series(
+async def real_nominal_sales_pc_time_series(
     city: str = "Cathedral City",
     data_path: str = None,
     save_path: str = None,
@@ -139,34 +152,10 @@ def real_nominal_sales_pc_time_series(
     )
 
     # Get CPI for inflation adjustment
-    load_dotenv()
     date = datetime.today()
     yr = date.year
-    apiKey = os.environ.get("API_KEY_FRED", None)
-    assert (
-        apiKey is not None
-    ), "Please ensure API_KEY_FRED is specified in your .env file."
-
-    base = "https://api.stlouisfed.org/fred/series/observations"
-
-    params = {
-        "series_id": "CPIAUCSL",
-        "observation_start": "2010-01-01",
-        "observation_end": f"{yr}-01-01",
-        "frequency": "m",
-        "api_key": apiKey,
-        "file_type": "json",
-    }
-
-    r = requests.get(base, params).json()
-    cpi_df = pd.json_normalize(r, record_path="observations")
-    cpi_df["year"] = cpi_df["date"].apply(
-        lambda x: datetime.strptime(x, "%Y-%m-%d").year
-    )
-    cpi_df["value"] = cpi_df["value"].astype(float)
-    cpi_df = (
-        cpi_df.groupby("year").agg({"value": "mean"}).rename(columns={"value": "CPI"})
-    )
+    cpi = (await _get_cpi())["2010-01-01":f"{yr}-01-01"]
+    cpi_df = cpi.groupby(cpi.index.year.rename("year")).mean().to_frame("CPI")
 
     # Get Population data
 
@@ -20,7 +20,7 @@ setup(
         "lowe.acs",
         "lowe.acs.tableids",
         "lowe.bls",
-        "lowe.fred",
+        "lowe.FRED",
         "lowe.edd",
         "lowe.tutorials",
         "lowe.locations",
@@ -29,6 +29,7 @@ setup(
         "lowe.dof",
         "lowe.dof.clean-data",
         "lowe.dof.scraped-data",
+        "lowe.utils",
     ],
     package_data={"": ["*.csv", "*.xls*"]},
     include_package_data=True,
@@ -58,6 +59,7 @@ setup(
         "pandas",
         "pandasql",
         "plotly==5.3.1",
+        "pyarrow",
         "python-dotenv",
         "pytz",
         "ratelimit",